@@ -7,18 +7,140 @@
 # This software is released under the MIT License.
 # -------------------------------------------------
 
+import io
+import os
 import sys
 import shutil
+import sqlite3
+import struct
+import time
+import hashlib
+import tarfile
+import threading
+import zipfile
 import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from types import SimpleNamespace
+from html import escape as html_escape
+import csv
 import json
 import itertools
+import math
+import mmap
+import random
+import re
+import tempfile
 import webbrowser
 
+# Pillowはサムネイルのスプライトの作成にのみ使う(インストールされていない場合は作成しない)
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
 # 出力ファイルを極力圧縮したい場合はTrueにする
 COMPRESS = False
 
+# 出力したページで使われていないCSSのルールを除いたstyle.<ハッシュ値>.cssを作成する場合はTrueにする
+PRUNE_CSS = True
+
+# 画像ファイルのハッシュ計算・コピーの並列数
+IMAGE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# 出力をzip/tarファイル1つにまとめる場合は"zip"または"tar"にする
+OUTPUT_ARCHIVE = None
+
+# ファイルコピーの並列数(Noneの場合は出力先のボリュームに応じて決める)
+COPY_WORKERS = None
+
+# データ詳細の出力方法("html":データごとにhtmlを出力、"viewer":共通のviewer.htmlとデータごとのjsを出力してブラウザで表示)
+DETAIL_MODE = "html"
+
+# データ詳細のファイル一覧1ページあたりの表示件数
+FILE_PAGE_SIZE = 100
+
+# メタデータ一覧(データ×メタデータ項目の表)の1ページあたりの表示件数
+MATRIX_PAGE_SIZE = 100
+# メタデータ一覧の値の列の幅(px)
+MATRIX_COLUMN_WIDTH = 180
+
+# データ詳細で同じ内容になる部品のキャッシュの上限(文字数)
+FRAGMENT_CACHE_SIZE = 32 * 1024 * 1024
+
+# --progressiveの場合にブラウザを開く前に作成するデータ詳細の件数(一覧の先頭から)
+PROGRESSIVE_FIRST = 30
+
+# 走査結果を出力フォルダのsqliteカタログに保存し、次回は変更のあったデータだけ読み直す場合はTrueにする
+USE_CATALOG = True
+
+# データ一覧のカード表示方法("html":全カードを出力、"virtual":json分割+仮想スクロール、"auto":件数で切り替え)
+INDEX_MODE = "auto"
+# "auto"の場合に仮想スクロールへ切り替えるデータ数
+VIRTUAL_INDEX_THRESHOLD = 1000
+# 仮想スクロール用のカードデータ1ファイルあたりの件数
+CARD_CHUNK_SIZE = 500
+# 仮想スクロールのカード1行の高さ(px)
+VIRTUAL_ROW_HEIGHT = 640
+
+# データ一覧のサムネイルを1枚の画像(スプライト)にまとめる場合はTrueにする(Pillowがインストールされている場合のみ)
+THUMBNAIL_SPRITE = True
+# スプライト1枚にまとめるサムネイルの件数(一覧の並び順で区切る)
+SPRITE_SIZE = 100
+# スプライトの作成の並列数
+SPRITE_WORKERS = os.cpu_count() or 1
+# スプライトの1件分の大きさ(データ一覧のサムネイルの表示サイズ(.image)と同じ)と1行に並べる件数
+SPRITE_CELL = (286, 200)
+SPRITE_COLUMNS = 10
+
+# 大きな画像を解像度ごとのタイルに分割し、表示範囲のタイルだけを読み込む場合はTrueにする(Pillowがインストールされている場合のみ)
+TILE_PYRAMID = True
+# タイルに分割する画像の大きさ(幅・高さのどちらかがこれを超える画像)(px)
+TILE_THRESHOLD = 4096
+# タイル1枚の大きさ(px)
+TILE_SIZE = 256
+# タイルの作成の並列数
+TILE_WORKERS = os.cpu_count() or 1
+
+# ファイル一覧でプレビュー(先頭の行と行数)を表示する構造化ファイルの拡張子
+TEXT_PREVIEW_SUFFIXES = (".csv", ".tsv", ".txt", ".dat")
+# プレビューに表示する先頭の行数
+TEXT_PREVIEW_ROWS = 20
+# プレビューのために読み込む先頭のバイト数の上限
+TEXT_PREVIEW_BYTES = 256 * 1024
+
+# 構造化ファイルのうち2列の数値のcsvをデータ詳細の概要にグラフで表示する場合はTrueにする
+CHART_STRUCTURED = True
+# グラフに表示する点の数の上限(これを超える場合は形を保つように間引く)
+CHART_POINTS = 2000
+# 1件のデータでグラフを表示するファイル数の上限
+CHART_MAX_FILES = 5
+
+# variableメタのステップ数がこれを超える場合は値の列を並べずに、数値の項目は小さなグラフ、それ以外は値の種類を表示する
+VARIABLE_COLUMNS_MAX = 20
+# variableメタのグラフに表示する点の数の上限(これを超える場合は形を保つように間引く)
+VARIABLE_CHART_POINTS = 200
+
+# データ一覧の検索インデックスで前方一致に使う文字数
+SEARCH_PREFIX_LEN = 3
+# CSSの要否の判定に使うクラス名・IDの抽出(jsの文字列中のhtmlやclassListの操作も含む)
+CSS_TOKEN_PATTERN = re.compile(r"""(?:class|id|className)\s*=\s*\\?["']([^"'\\]*)|classList\.\w+\(\s*['"]([^'"]*)""")
+
+# 外部のURLを参照している箇所の検出(ネットワークに接続できない環境でも待たずに表示できるように出力時に確認する)
+EXTERNAL_REF_PATTERN = re.compile(r"""(?:\b(?:src|href|poster|action)\s*=\s*\\?["']?|url\(\s*\\?["']?|@import\s+\\?["'])((?:[a-zA-Z][\w+.-]*:)?//[^"'\s)>\\]+)""")
+
+# 各ページが参照するスタイルシート
+STYLE_FILE = "style.css"
+# 使われていないルールを除く場合の仮の参照先(すべてのページを出力した後に、同じ長さのstyle.<ハッシュ値>.cssへ該当箇所だけ上書きする)
+PENDING_STYLE_FILE = "style.css?" + "0" * 16
+# 上書きするページ中の参照(前回の実行で上書き済みのページも対象にする)
+STYLE_LINK_PATTERN = re.compile(rb'href="(style\.css\?0{16}|style\.[0-9a-f]{16}\.css)"')
+
+# 検索用トークンの区切り(英数字の連続、またはそれ以外の文字の連続)
+SEARCH_TOKEN_PATTERN = r"[0-9a-z]+|[^\x00-\x7f\s、。，．・「」（）]+"
+
 class Terms:
     """ 試料用語の定義 """
 
@@ -95,11 +217,670 @@ class OneTimeUse:
         self.used = True
         return str(self.value)
 
+class MetaMatrix:
+    """ データ×メタデータ(constant)の表(項目ごとの列の配列としてデータ情報の取得と同時に埋める) """
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self.columns = {}
+
+    def add(self, data):
+        """ データ1件分の行の追加 """
+
+        row = len(self.ids)
+        self.ids.append(data["id"])
+        self.names.append(get_dataname(data))
+        for k, v in data["metadata"].get("constant", {}).items():
+            value = v.get("value") if isinstance(v, dict) else v
+            if value is None or value == "":
+                continue
+
+            # 同じ値が多いため、列ごとに値の一覧と番号(値がない場合は-1)で保持する
+            value = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+            column = self.columns.setdefault(k, {"values":[], "codes":[], "index":{}})
+            code = column["index"].setdefault(value, len(column["values"]))
+            if code == len(column["values"]):
+                column["values"].append(value)
+            column["codes"].extend([-1] * (row - len(column["codes"])))
+            column["codes"].append(code)
+
+    def to_dict(self, metadef_data):
+        """ 出力用のデータ(列はmetadata-def.jsonのorder順、定義にない項目はその後に名前順) """
+
+        keys = sort_meta(metadef_data, self.columns) + sorted(k for k in self.columns if k not in metadef_data)
+        columns = []
+        for k in keys:
+            column = self.columns[k]
+            metadef = metadef_data.get(k, {})
+            columns.append({"key":k,
+                            "ja":get_value(metadef.get("name", {}).get("ja"), k),
+                            "en":get_value(metadef.get("name", {}).get("en"), k),
+                            "unit":get_value(metadef.get("unit")),
+                            "values":column["values"],
+                            "codes":column["codes"] + [-1] * (len(self.ids) - len(column["codes"]))})
+        return {"ids":self.ids, "names":self.names, "columns":columns}
+
+class Catalog:
+    """ 走査したデータ・ファイル・送り状・メタデータのsqliteカタログ """
+
+    file_name = "catalog.sqlite"
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS entries (id TEXT PRIMARY KEY, dir TEXT, signature TEXT, invoice TEXT, metadata TEXT);
+        CREATE TABLE IF NOT EXISTS files (entry_id TEXT, dir TEXT, name TEXT, size INTEGER, mtime REAL, PRIMARY KEY (entry_id, dir, name));
+        CREATE TABLE IF NOT EXISTS invoice (entry_id TEXT, field TEXT, value TEXT, PRIMARY KEY (entry_id, field));
+        CREATE TABLE IF NOT EXISTS metadata (entry_id TEXT, key TEXT, step INTEGER, value TEXT, unit TEXT, PRIMARY KEY (entry_id, key, step));
+    """
+
+    def __init__(self, db_file, seed_file=None):
+        # 前回の出力フォルダのカタログを引き継ぐ(WALに残っている分も含めてコピーする)
+        if seed_file is not None and not db_file.exists():
+            src = sqlite3.connect(seed_file)
+            dst = sqlite3.connect(db_file)
+            src.backup(dst)
+            src.close()
+            dst.close()
+            write_log(f"[Info] 前回のカタログ {seed_file} を引き継ぎました。")
+
+        self.db = sqlite3.connect(db_file)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.schema)
+        self.entries = None
+        self.pending = {"entries":[], "files":[], "invoice":[], "metadata":[]}
+        self.loaded = 0
+
+    @staticmethod
+    def get_signature(entry_dir):
+        """ 変更の判定に使う値(フォルダとその直下のフォルダ、送り状とメタデータのjsonの更新日時) """
+
+        targets = [entry_dir] + sorted(d for d in entry_dir.iterdir() if d.is_dir())
+        targets += [entry_dir.joinpath("invoice", "invoice.json"), entry_dir.joinpath("meta", "metadata.json")]
+        signature = []
+        for target in targets:
+            try:
+                stat = target.stat()
+                signature.append([target.name, stat.st_mtime_ns, stat.st_size])
+            except OSError:
+                signature.append([target.name, None, None])
+        return json.dumps(signature)
+
+    def load(self, data_id, entry_dir, signature):
+        """ 前回から変更のないデータの情報の取得 """
+
+        # 1件ずつ問い合わせると遅いため、最初に全件をまとめて読み込む
+        if self.entries is None:
+            self.entries = {row[0]:row[1:] + ({},) for row in self.db.execute("SELECT id, dir, signature, invoice, metadata FROM entries")}
+            for entry_id, dr, name, size, mtime in self.db.execute("SELECT entry_id, dir, name, size, mtime FROM files ORDER BY rowid"):
+                if entry_id in self.entries:
+                    self.entries[entry_id][4].setdefault(dr, []).append({"name":name, "size":format_file_size(size), "bytes":size, "mtime":mtime})
+
+        entry = self.entries.get(data_id)
+        if entry is None or entry[0] != str(entry_dir) or entry[1] != signature:
+            return None
+
+        self.loaded += 1
+        return {"id":data_id, "dir":entry_dir, "files":entry[4],
+                "invoice":hd_update(get_default_invoice(), json.loads(entry[2])),
+                "metadata":json.loads(entry[3])}
+
+    def add(self, info, signature, invoice):
+        """ 読み込んだデータの情報の追加(1000件ごとにまとめて書き込む) """
+
+        data_id = info["id"]
+        files = [(data_id, dr, f["name"], f["bytes"], f["mtime"]) for dr, fs in info["files"].items() for f in fs]
+        fields = [(data_id, field, value) for field, value in flatten_fields(info["invoice"])]
+        metadata = [(data_id, k, -1, get_field_text(v.get("value")), v.get("unit")) for k, v in info["metadata"].get("constant", {}).items()]
+        for step, variable in enumerate(info["metadata"].get("variable", [])):
+            metadata += [(data_id, k, step, get_field_text(v.get("value")), v.get("unit")) for k, v in variable.items()]
+
+        self.pending["entries"].append((data_id, str(info["dir"]), signature,
+                                        json.dumps(invoice, ensure_ascii=False), json.dumps(info["metadata"], ensure_ascii=False)))
+        self.pending["files"] += files
+        self.pending["invoice"] += fields
+        self.pending["metadata"] += metadata
+        if len(self.pending["entries"]) >= 1000:
+            self.flush()
+
+    def flush(self):
+        """ 追加したデータの一括書き込み """
+
+        if not self.pending["entries"]:
+            return
+
+        ids = [(e[0],) for e in self.pending["entries"]]
+        with self.db:
+            self.db.executemany("""INSERT INTO entries VALUES (?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET
+                                   dir=excluded.dir, signature=excluded.signature, invoice=excluded.invoice, metadata=excluded.metadata""", self.pending["entries"])
+            for table in ["files", "invoice", "metadata"]:
+                self.db.executemany(f"DELETE FROM {table} WHERE entry_id = ?", ids)
+            self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", self.pending["files"])
+            self.db.executemany("INSERT OR REPLACE INTO invoice VALUES (?, ?, ?)", self.pending["invoice"])
+            self.db.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?)", self.pending["metadata"])
+        self.pending = {"entries":[], "files":[], "invoice":[], "metadata":[]}
+
+    def prune(self, data_ids):
+        """ 今回見つからなかったデータの削除 """
+
+        self.flush()
+        keep = set(data_ids)
+        removed = [(row[0],) for row in self.db.execute("SELECT id FROM entries") if row[0] not in keep]
+        with self.db:
+            for table, column in [("entries", "id"), ("files", "entry_id"), ("invoice", "entry_id"), ("metadata", "entry_id")]:
+                self.db.executemany(f"DELETE FROM {table} WHERE {column} = ?", removed)
+
+    def close(self):
+        self.flush()
+        self.db.close()
+        write_log(f"[Info] カタログから変更のないデータ {self.loaded} 件を読み込みました。")
+
+class FragmentCache:
+    """ データ詳細で同じ内容になるhtml部品の使い回し(合計文字数が上限を超えたら古いものから捨てる) """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, render):
+        """ 部品の取得(keyには部品の内容を決める値をすべて含める) """
+
+        html = self.items.get(key)
+        if html is not None:
+            self.items.move_to_end(key)
+            self.hits += 1
+            return html
+
+        self.misses += 1
+        html = render()
+        self.items[key] = html
+        self.size += len(html)
+        while self.size > self.max_size:
+            _, old = self.items.popitem(last=False)
+            self.size -= len(old)
+        return html
+
+    def write_stats(self, name):
+        total = self.hits + self.misses
+        if total:
+            write_log(f"[Info] {name}の部品キャッシュ: ヒット {self.hits} 件、ミス {self.misses} 件(ヒット率 {self.hits / total:.1%}、{len(self.items)} 件保持)")
+
+class CssTokens:
+    """ 出力したhtml・jsで使われているクラス名・IDの収集 """
+
+    def __init__(self):
+        self.tokens = set()
+        self.seen = set()
+
+    def add(self, name, text):
+        if not PRUNE_CSS or not name.endswith((".html", ".js")):
+            return
+
+        # ページの大部分は共通のテンプレートのため、タグ単位で一度調べた部分は読み飛ばす
+        parts = set(text.split("<"))
+        parts -= self.seen
+        if len(self.seen) >= 200000:
+            self.seen.clear()
+        self.seen |= parts
+        for part in parts:
+            if "class" in part or "id" in part:
+                for m in CSS_TOKEN_PATTERN.finditer(part):
+                    self.tokens.update((m.group(1) or m.group(2) or "").split())
+
+class ArchiveMember(io.RawIOBase):
+    """ 無圧縮tarアーカイブ内のファイルの読み込み """
+
+    def __init__(self, archive_file, offset, size):
+        self.f = open(archive_file, "rb")
+        self.f.seek(offset)
+        self.offset = offset
+        self.size = size
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        """ メンバー内の位置の移動(画像のヘッダーの読み込みやPillowで使う) """
+
+        if whence == io.SEEK_CUR:
+            pos += self.pos
+        elif whence == io.SEEK_END:
+            pos += self.size
+        self.pos = max(pos, 0)
+        self.f.seek(self.offset + min(self.pos, self.size))
+        return self.pos
+
+    def readinto(self, b):
+        n = self.f.readinto(memoryview(b)[:max(min(len(b), self.size - self.pos), 0)])
+        self.pos += n
+        return n
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+class Archive:
+    """ zip/tarアーカイブの目次 """
+
+    def __init__(self, archive_file):
+        self.path = archive_file
+        self.members = {}
+        self.children = {"": set()}
+
+        # 目次(zipのセントラルディレクトリ、tarのヘッダー)だけを読み込み、展開はしない
+        if zipfile.is_zipfile(archive_file):
+            self.zip = zipfile.ZipFile(archive_file)
+            for info in self.zip.infolist():
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                self.add(info.filename, info.is_dir(), info.file_size, mtime, info)
+        else:
+            self.zip = None
+            with tarfile.open(archive_file, "r:") as tar:
+                for info in tar:
+                    if info.isdir() or info.isfile():
+                        self.add(info.name, info.isdir(), info.size, info.mtime, info.offset_data)
+
+        # フォルダごとアーカイブされている場合はそのフォルダを入力フォルダとする
+        self.root = ""
+        top = list(self.children[""])
+        if "meta" not in top and len(top) == 1 and top[0] in self.children:
+            self.root = top[0]
+
+    def add(self, name, is_dir, size, mtime, info):
+        """ メンバーの登録 """
+
+        name = name.replace("\\", "/").strip("/")
+        while name.startswith("./"):
+            name = name[2:]
+        if name == "":
+            return
+        self.members[name] = {"is_dir":is_dir, "size":size, "mtime":mtime, "info":info}
+        if is_dir:
+            self.children.setdefault(name, set())
+
+        # 親フォルダがアーカイブに含まれない場合もあるため補完する
+        parent, _, child = name.rpartition("/")
+        while True:
+            self.children.setdefault(parent, set()).add(child)
+            if parent == "" or parent in self.members:
+                break
+            self.members[parent] = {"is_dir":True, "size":0, "mtime":mtime, "info":None}
+            parent, _, child = parent.rpartition("/")
+
+    def open(self, name):
+        """ メンバーをバイナリで開く """
+
+        info = self.members[name]["info"]
+        if self.zip is not None:
+            return self.zip.open(info)
+        return io.BufferedReader(ArchiveMember(self.path, info, self.members[name]["size"]))
+
+class ArchivePath:
+    """ アーカイブ内のパス(入力フォルダとして使うpathlib.Pathの機能のみ) """
+
+    def __init__(self, archive, name=None):
+        self.archive = archive
+        self.path = archive.root if name is None else name
+
+    def __str__(self):
+        return f"{self.archive.path}:{self.path}"
+
+    def __eq__(self, other):
+        return isinstance(other, ArchivePath) and (self.archive, self.path) == (other.archive, other.path)
+
+    def __lt__(self, other):
+        return self.path < other.path
+
+    def __hash__(self):
+        return hash((id(self.archive), self.path))
+
+    @property
+    def name(self):
+        return self.path.rpartition("/")[2]
+
+    @property
+    def suffix(self):
+        return Path(self.name).suffix
+
+    def joinpath(self, *parts):
+        return ArchivePath(self.archive, "/".join([self.path, *parts]).strip("/"))
+
+    def exists(self):
+        return self.path == "" or self.path in self.archive.members
+
+    def is_dir(self):
+        return self.path in self.archive.children
+
+    def is_file(self):
+        return self.exists() and not self.is_dir()
+
+    def iterdir(self):
+        for child in sorted(self.archive.children[self.path]):
+            yield self.joinpath(child)
+
+    def stat(self):
+        member = self.archive.members.get(self.path, {"size":0, "mtime":os.stat(self.archive.path).st_mtime})
+        mtime_ns = int(member["mtime"] * 1e9)
+        return SimpleNamespace(st_size=member["size"], st_mtime=member["mtime"], st_mtime_ns=mtime_ns, st_atime_ns=mtime_ns)
+
+    def open(self, mode="r", encoding=None):
+        f = self.archive.open(self.path)
+        if "b" in mode:
+            return f
+        return io.TextIOWrapper(f, encoding=encoding)
+
+class Journal:
+    """ 完了したステージ・データの記録(中断したプレビュー作成の再開用) """
+
+    file_name = "journal.jsonl"
+
+    def __init__(self, root, resume):
+        self.root = root
+        self.path = root.joinpath(self.file_name)
+        self.records = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        # 1行に1件ずつ追記しているため、中断時に書きかけだった最後の行は読み飛ばす
+        if resume and self.path.exists():
+            with open(self.path, encoding="utf_8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.records[(record["stage"], record["key"])] = record
+            write_log(f"[Info] 前回の記録 {len(self.records)} 件を読み込みました。")
+        self.f = open(self.path, "a" if resume else "w", encoding="utf_8")
+
+    def get(self, stage, key, fingerprint):
+        """ 入力が変わっておらず、出力ファイルも完全に残っている記録の取得 """
+
+        record = self.records.get((stage, key))
+        if record is None or record["input"] != fingerprint:
+            return None
+
+        # 書きかけのファイルや後から変更されたファイルがあれば作り直す
+        for name, (size, digest) in record["files"].items():
+            out_file = self.root.joinpath(name)
+            try:
+                if out_file.stat().st_size != size:
+                    return None
+                if digest is not None and get_file_hash(out_file) != digest:
+                    return None
+            except OSError:
+                return None
+        return record
+
+    def begin(self, stage, key, fingerprint):
+        """ 記録の開始(以降に書き込んだファイルを記録に含める) """
+
+        self.local.record = {"stage":stage, "key":key, "input":fingerprint, "files":{}}
+
+    def add_file(self, name, size, digest):
+        record = getattr(self.local, "record", None)
+        if record is not None:
+            record["files"][name] = [size, digest]
+
+    def is_recording(self):
+        return getattr(self.local, "record", None) is not None
+
+    def discard(self):
+        """ 記録の破棄(途中で失敗した場合は次回もやり直す) """
+
+        self.local.record = None
+
+    def commit(self, **extra):
+        """ 記録の確定 """
+
+        record = self.local.record
+        self.local.record = None
+        record.update(extra)
+        with self.lock:
+            self.records[(record["stage"], record["key"])] = record
+            self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.f.flush()
+
+    def close(self):
+        with self.lock:
+            self.f.close()
+
+class OutputDir:
+    """ フォルダへの出力 """
+
+    def __init__(self, root, resume=False):
+        self.root = root
+        self.journal = Journal(root, resume)
+        self.css_tokens = CssTokens()
+        self.external_refs = set()
+        self.styled = set()
+
+    def __str__(self):
+        return str(self.root)
+
+    def write_text(self, name, text):
+        """ テキストファイルの書き込み """
+
+        # スタイルシートの参照を後から上書きするページは、記録ではサイズのみ確認する
+        pending = f'href="{PENDING_STYLE_FILE}"' in text
+        self.write_bytes(name, text.encode("utf_8"), verify=not pending)
+        if pending:
+            self.styled.add(name)
+        self.css_tokens.add(name, text)
+        check_external_refs(name, text, self.external_refs)
+
+    def write_bytes(self, name, data, verify=True):
+        """ ファイルの書き込み(書きかけのファイルが残らないように一時ファイルから置き換える) """
+
+        out_file = self.root.joinpath(name)
+        out_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = out_file.with_name(out_file.name + f".{threading.get_ident()}.tmp")
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+        os.replace(tmp_file, out_file)
+        if self.journal.is_recording():
+            self.journal.add_file(name, len(data), hashlib.blake2b(data, digest_size=16).hexdigest() if verify else None)
+
+    def copy_files(self, pairs):
+        """ ファイルのコピー(コピーに失敗したファイルの名前を返す) """
+
+        failed = copy_files([(ifile, self.root.joinpath(name)) for ifile, name in pairs])
+        return {out_file.relative_to(self.root).as_posix() for ifile, out_file in failed}
+
+    def get_done(self, stage, key, fingerprint):
+        """ 前回までに完了している記録の取得 """
+
+        record = self.journal.get(stage, key, fingerprint)
+        if record is not None and PRUNE_CSS:
+            # 前回作成済みのページも、使われているクラス名を集めてスタイルシートの参照を上書きする
+            for name in record["files"]:
+                if name.endswith((".html", ".js")):
+                    self.css_tokens.add(name, self.root.joinpath(name).read_text(encoding="utf_8"))
+                if name.endswith(".html"):
+                    self.styled.add(name)
+        return record
+
+    def link_css(self, css_file):
+        """ 出力したページのスタイルシートの参照の上書き(<head>内の同じ長さの名前だけを書き換える) """
+
+        for name in self.styled:
+            with open(self.root.joinpath(name), "r+b") as f:
+                m = STYLE_LINK_PATTERN.search(f.read(16384))
+                if m is not None:
+                    f.seek(m.start(1))
+                    f.write(css_file.encode("utf_8"))
+
+        # 途中経過を表示している間に参照していた、すべてのルールを含むスタイルシートは不要になる
+        self.root.joinpath("style.css").unlink(missing_ok=True)
+
+    def begin(self, stage, key, fingerprint=None):
+        self.journal.begin(stage, key, fingerprint)
+
+    def add_file(self, name, size):
+        """ write_text以外で書き込んだファイルの記録(サイズのみ確認する) """
+
+        self.journal.add_file(name, size, None)
+
+    def commit(self, **extra):
+        self.journal.commit(**extra)
+
+    def discard(self):
+        self.journal.discard()
+
+    def close(self):
+        self.journal.close()
+
+class OutputArchive:
+    """ zip/tarファイルへの出力(小さなファイルを大量に置く代わりに1ファイルに順次書き込む) """
+
+    def __init__(self, archive_file):
+        self.path = archive_file
+        self.lock = threading.Lock()
+        self.css_tokens = CssTokens()
+        self.external_refs = set()
+        self.pending = None
+        self.pending_pages = []
+        if archive_file.suffix == ".zip":
+            self.zip = zipfile.ZipFile(archive_file, "w")
+            self.tar = None
+        else:
+            self.zip = None
+            self.tar = tarfile.open(archive_file, "w:")
+
+    def __str__(self):
+        return str(self.path)
+
+    def add(self, name, f, size, mtime, compress):
+        """ メンバーの追加 """
+
+        with self.lock:
+            if self.zip is not None:
+                info = zipfile.ZipInfo(name, time.localtime(max(mtime, 315532800))[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+                info.file_size = size
+                with self.zip.open(info, "w", force_zip64=True) as fo:
+                    shutil.copyfileobj(f, fo, 1024 * 1024)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = size
+                info.mtime = mtime
+                self.tar.addfile(info, f)
+
+    def write_text(self, name, text):
+        """ テキストファイルの書き込み """
+
+        data = text.encode("utf_8")
+        self.css_tokens.add(name, text)
+        check_external_refs(name, text, self.external_refs)
+
+        # 書き込んだメンバーは書き換えられないため、スタイルシートの参照を含むページは一時ファイルに溜めて最後に格納する
+        if f'href="{PENDING_STYLE_FILE}"' in text:
+            with self.lock:
+                if self.pending is None:
+                    self.pending = tempfile.TemporaryFile()
+                self.pending.seek(0, io.SEEK_END)
+                self.pending_pages.append((name, self.pending.tell(), len(data), time.time()))
+                self.pending.write(data)
+            return
+        self.add(name, io.BytesIO(data), len(data), time.time(), True)
+
+    def write_bytes(self, name, data):
+        """ 画像ファイルの書き込み(圧縮しても小さくならないため無圧縮で格納する) """
+
+        self.add(name, io.BytesIO(data), len(data), time.time(), False)
+
+    def copy_files(self, pairs):
+        """ ファイルのコピー(画像は圧縮しても小さくならないため無圧縮で格納する)(開けなかったファイルの名前を返す) """
+
+        start = time.perf_counter()
+        total = 0
+        failed = set()
+        for ifile, name in pairs:
+            # 格納を始める前に開けないファイルは飛ばす(書きかけのメンバーは取り消せないため、格納中の失敗は全体のエラーにする)
+            try:
+                stat = ifile.stat()
+                f = ifile.open("rb")
+            except Exception:
+                write_log(f"[Error] ファイル {ifile} のコピーに失敗しました。処理を続行します。\n{traceback.format_exc()}")
+                failed.add(name)
+                continue
+            with f:
+                self.add(name, f, stat.st_size, stat.st_mtime, False)
+            total += stat.st_size
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        write_log(f"[Info] ファイル {len(pairs) - len(failed)} 件を {self.path.name} に格納しました。({format_file_size(total)}、{total / 1024 / 1024 / elapsed:.1f} MB/s)")
+        return failed
+
+    def link_css(self, css_file):
+        """ 溜めておいたページのスタイルシートの参照を書き換えて格納 """
+
+        for name, offset, size, mtime in self.pending_pages:
+            self.pending.seek(offset)
+            data = self.pending.read(size).replace(f'href="{PENDING_STYLE_FILE}"'.encode("utf_8"), f'href="{css_file}"'.encode("utf_8"), 1)
+            self.add(name, io.BytesIO(data), len(data), mtime, True)
+        self.pending_pages = []
+
+    # アーカイブへの出力は途中から再開できないため、記録は残さない
+    def get_done(self, stage, key, fingerprint):
+        return None
+
+    def begin(self, stage, key, fingerprint=None):
+        pass
+
+    def add_file(self, name, size):
+        pass
+
+    def commit(self, **extra):
+        pass
+
+    def discard(self):
+        pass
+
+    def close(self):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.close()
+            if self.zip is not None:
+                self.zip.close()
+            else:
+                self.tar.close()
+
+def open_input_dir(input_dir):
+    """ 入力フォルダの取得(zip/tarファイルの場合は展開せずに直接読み込む) """
+
+    if not input_dir.is_file():
+        return input_dir
+
+    if zipfile.is_zipfile(input_dir) or tarfile.is_tarfile(input_dir):
+        try:
+            archive = Archive(input_dir)
+        except tarfile.ReadError:
+            write_log(f"[Error] 指定した入力ファイル {input_dir} は圧縮されたtarファイルのため読み込めません。無圧縮のtarファイルかzipファイルを指定してください。")
+            return input_dir
+        write_log(f"[Info] 指定したアーカイブ {input_dir} を入力フォルダとして読み込みます。")
+        return ArchivePath(archive)
+
+    return input_dir
+
 def get_file_size(ifile):
     """ ファイルサイズの取得 """
 
+    return format_file_size(ifile.stat().st_size)
+
+def format_file_size(file_size):
+    """ ファイルサイズの表示用文字列の取得 """
+
     units = ["B", "kB", "MB", "GB", "TB"]
-    file_size = ifile.stat().st_size
     index = 0
     for i in range(len(units)):
         if file_size < 1024:
@@ -108,6 +889,12 @@ def get_file_size(ifile):
         file_size /= 1024
     return f"{file_size:.2f} {units[index]}"
 
+def get_file_info(ifile):
+    """ ファイル情報の取得 """
+
+    stat = ifile.stat()
+    return {"name":ifile.name, "size":format_file_size(stat.st_size), "bytes":stat.st_size, "mtime":stat.st_mtime}
+
 def get_value(data, default=""):
     """ デフォルト値指定で値の取得 """
 
@@ -118,15 +905,35 @@ def get_value(data, default=""):
 
     return value
 
+def get_image_path(data, dr, f):
+    """ 出力先の画像ファイルのパスの取得 """
+
+    # 画像ストアにコピー済みの場合はそのパスを使う
+    return f.get("path", f"./images/{data['id']}/{dr}/{f['name']}")
+
+def get_images(data):
+    """ 表示する画像(メイン画像・その他の画像のうち、画像ストアにコピーできたもの)の取得 """
+
+    return [(m, img) for m in ["main_image", "other_image"] for img in data["files"].get(m, []) if "path" in img]
+
 def get_thumbnail(data):
     """ サムネイル画像の取得 """
 
     img_path = ""
     thumb = data["files"].get("thumbnail", [])
-    if len(thumb) > 0:
-        img_path = f"./images/{data['id']}/thumbnail/{thumb[0]['name']}"
+    # 画像ストアにまだコピーしていない(段階的に作成している途中の)画像は、画像なしとして表示する
+    if len(thumb) > 0 and "path" in thumb[0]:
+        img_path = get_image_path(data, "thumbnail", thumb[0])
     return img_path
 
+def get_thumbnail_attrs(data):
+    """ サムネイル画像の幅・高さの属性の取得 """
+
+    thumb = data["files"].get("thumbnail", [])
+    if len(thumb) > 0:
+        return get_image_attrs(thumb[0])
+    return ""
+
 def get_file_len(data, dirs):
     """ ファイル数の取得 """
 
@@ -135,36 +942,140 @@ def get_file_len(data, dirs):
         file_len += len(data["files"].get(d, []))
     return file_len
 
-def get_data_info(input_dir):
-    """ データ情報の取得 """
+def get_sample_id(data):
+    """ 試料IDの取得 """
+
+    if len(data["invoice"]["sample"]["names"]) > 0:
+        sample_id = data["invoice"]["sample"]["names"][0]
+    else:
+        sample_id = data["invoice"]["sample"]["sampleId"]
+    return sample_id
+
+def get_dataname(data):
+    """ データ名の取得 """
+
+    if data["invoice"]["basic"]["dataName"]:
+        dataname = data["invoice"]["basic"]["dataName"]
+    else:
+        dataname = f"プレビュー_{data['id']}"
+    return dataname
+
+def get_id_key(data_id):
+    """ データIDの並び順のキー(数値のIDは桁数によらず数値順、それ以外はその後に名前順) """
+
+    if data_id.isdigit():
+        return (0, int(data_id), data_id)
+    return (1, 0, data_id)
+
+def get_divisions(divided_dir):
+    """ dividedフォルダの一覧の取得(数値が大きい方がデータ一覧ページの上にくるように並べる) """
+
+    if not divided_dir.exists():
+        return []
+
+    divs = [div for div in divided_dir.iterdir() if div.is_dir()]
+    divs.sort(key=lambda div: get_id_key(div.name))
+    # 数値のIDは降順、数値以外のIDは末尾に名前順で並べる
+    numeric = [div for div in divs if div.name.isdigit()]
+    others  = [div for div in divs if not div.name.isdigit()]
+    return numeric[::-1] + others
+
+def get_top_id(divs):
+    """ トップのデータIDの取得(dividedの最大の番号の次の番号) """
+
+    numbers = [div.name for div in divs if div.name.isdigit()]
+    if len(numbers) == 0:
+        return "0001"
+    width = max(4, max(len(n) for n in numbers))
+    return f"{max(int(n) for n in numbers)+1:0{width}d}"
+
+def get_data_no(data_id):
+    """ データ一覧に表示するデータ番号の取得 """
+
+    if data_id.isdigit():
+        return str(int(data_id))
+    return data_id
+
+def select_divisions(divs, options):
+    """ 部分プレビューの対象とするdividedフォルダの選択 """
+
+    if options.get("first") is not None:
+        # 番号の小さい方から選ぶ(divsは番号の大きい順)
+        first = set(sorted(divs, key=lambda div: get_id_key(div.name))[:options["first"]])
+        divs = [div for div in divs if div in first]
+    if options.get("sample") is not None:
+        picked = set(random.Random(options.get("seed")).sample(range(len(divs)), min(options["sample"], len(divs))))
+        divs = [div for i, div in enumerate(divs) if i in picked]
+    return divs
+
+def is_selected(data_id, options):
+    """ --onlyで指定したデータIDに含まれるかの判定 """
+
+    if options.get("only") is None:
+        return True
+    return data_id in options["only"] or (data_id.isdigit() and int(data_id) in options["only"])
+
+def get_entry_info(data_id, entry_dir, catalog=None):
+    """ データ1件分の情報の取得 """
+
+    # 1件のデータの不備で全体が止まらないように、失敗した場合はエラーとして記録して続ける
+    try:
+        # カタログに前回と同じ状態で記録されているデータはjsonやファイル一覧を読み直さない
+        if catalog is not None:
+            signature = catalog.get_signature(entry_dir)
+            info = catalog.load(data_id, entry_dir, signature)
+            if info is not None:
+                return info
+
+        invoice = read_json(entry_dir.joinpath("invoice", "invoice.json"))
+        info = {"id":data_id, "dir":entry_dir, "files":{},
+                "invoice":hd_update(get_default_invoice(), invoice),
+                "metadata":read_json(entry_dir.joinpath("meta", "metadata.json"))}
+        for d in entry_dir.iterdir():
+            if d.is_dir():
+                info["files"][d.name] = [get_file_info(f) for f in d.iterdir()]
+
+        if catalog is not None:
+            catalog.add(info, signature, invoice)
+    except Exception:
+        info = {"id":data_id, "dir":entry_dir, "files":{},
+                "invoice":get_default_invoice(), "metadata":{"constant":{}, "variable":[]}}
+        add_error(info, "データ情報の取得")
+    return info
+
+def get_data_info(input_dir, options=None, matrix=None, catalog=None):
+    """ データ情報の取得(matrixを指定した場合はメタデータ一覧の列も埋める) """
+
+    if options is None:
+        options = {}
+
+    # dividedフォルダの一覧(並び順はここで一度だけ決め、画像のコピーやページの作成もこの順で行う)
+    divs = get_divisions(input_dir.joinpath("divided"))
+
+    # データ一覧ページの並び順の関係でdividedがあればトップを最後のデータIDにする
+    top_id = get_top_id(divs)
+
+    # 部分プレビューの場合は対象外のdividedフォルダの中身は参照しない
+    selected = [div for div in select_divisions(divs, options) if is_selected(div.name, options)]
+    if len(selected) < len(divs):
+        write_log(f"[Info] 部分プレビューのため、divided {len(divs)} 件中 {len(selected)} 件を処理します。")
 
     data_info = []
     # トップのフォルダ情報
-    info = {"id":"0001", "files":{},
-            "invoice":read_json(input_dir.joinpath("invoice", "invoice.json"), invoice=True),
-            "metadata":read_json(input_dir.joinpath("meta", "metadata.json"))}
-    for d in input_dir.iterdir():
-        if d.is_dir():
-            info["files"][d.name] = [{"name":f.name, "size":get_file_size(f)} for f in d.iterdir()]
-    data_info.append(info)
+    if is_selected(top_id, options):
+        data_info.append(get_entry_info(top_id, input_dir, catalog))
+        if matrix is not None:
+            matrix.add(data_info[-1])
 
     # dividedフォルダの情報
-    divided_dir = input_dir.joinpath("divided")
-    if divided_dir.exists():
-        # 数値が大きい方がデータ一覧ページの上にくるようにソートする
-        for div in sorted(divided_dir.iterdir(), reverse=True):
-            info = {"id":div.name, "files":{},
-                    "invoice":read_json(div.joinpath("invoice", "invoice.json"), invoice=True),
-                    "metadata":read_json(div.joinpath("meta", "metadata.json"))}
-            for d in div.iterdir():
-                if d.is_dir():
-                    info["files"][d.name] = [{"name":f.name, "size":get_file_size(f)} for f in d.iterdir()]
-
-            data_info.append(info)
+    for div in selected:
+        data_info.append(get_entry_info(div.name, div, catalog))
+        if matrix is not None:
+            matrix.add(data_info[-1])
 
-    # データ一覧ページの並び順の関係でdividedがあればトップを最後のデータIDにする
-    if len(data_info) > 1:
-        data_info[0]["id"] = f"{int(data_info[1]['id'])+1:04d}"
+    # すべてのデータを走査した場合のみ、なくなったデータをカタログから削除する
+    if catalog is not None and len(data_info) == len(divs) + 1:
+        catalog.prune([d["id"] for d in data_info])
 
     return data_info
 
@@ -186,38 +1097,59 @@ def hd_update(tgtDict, patchDict):
     return ret
 
 
+def flatten_fields(data, prefix=""):
+    """ 入れ子の辞書を(項目名, 値)の組に展開する(項目名は.区切り) """
+
+    for k, v in data.items():
+        field = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            yield from flatten_fields(v, field)
+        else:
+            yield field, get_field_text(v)
+
+def get_field_text(value):
+    """ カタログに保存する値(文字列以外はjsonにする) """
+
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
 def read_json(ifile, invoice=False):
     """ jsonファイルの読み込み """
 
     if ifile.exists():
-        with open(ifile, "r", encoding="utf_8") as f:
+        with ifile.open("r", encoding="utf_8") as f:
             data = json.load(f)
     else:
         data = {}
 
     if invoice:
-        default = {"datasetId": "",
-                   "basic": {
-                     "dateSubmitted": datetime.now().strftime("%Y-%m-%d"),
-                     "dataOwnerId": "プレビューユーザ",
-                     "dataName": "",
-                     "instrumentId": "",
-                     "experimentId": "",
-                     "description": ""
-                   },
-                   "sample": {
-                     "sampleId": "",
-                     "names": [],
-                     "ownerId": "",
-                     "composition": "",
-                     "referenceUrl": "",
-                     "description": ""
-                   }
-                  }
-
-        data = hd_update(default, data)
+        data = hd_update(get_default_invoice(), data)
     return data
 
+def get_default_invoice():
+    """ 送り状のデフォルト値 """
+
+    default = {"datasetId": "",
+               "basic": {
+                 "dateSubmitted": datetime.now().strftime("%Y-%m-%d"),
+                 "dataOwnerId": "プレビューユーザ",
+                 "dataName": "",
+                 "instrumentId": "",
+                 "experimentId": "",
+                 "description": ""
+               },
+               "sample": {
+                 "sampleId": "",
+                 "names": [],
+                 "ownerId": "",
+                 "composition": "",
+                 "referenceUrl": "",
+                 "description": ""
+               }
+              }
+    return default
+
 def sort_meta(metadef_data, metakeys):
     """ medakeysのソート """
 
@@ -229,7 +1161,7 @@ def sort_meta(metadef_data, metakeys):
 
     return new_metakeys
 
-def create_dataDetail(input_dir, out_root_dir, data_info, metadef_data, invsche_data):
+def create_dataDetail(input_dir, out_sink, data_info, metadef_data, invsche_data, progress=None):
     """ dataDetailのhtml作成 """
 
     filedirs = {"raw":"rawデータファイル",
@@ -241,6 +1173,46 @@ def create_dataDetail(input_dir, out_root_dir, data_info, metadef_data, invsche_
 
     terms = Terms()
 
+    # ファイル一覧の行(ブラウザ側で{{...}}を置き換えて表示する)
+    file_row_template = """
+        <tr>
+          <td><div class="word-break m-0">{{No}}</div></td>
+          <td><div class="word-break m-0">{{種別}}</div></td>
+          <td>
+            <div>
+              <div class="d-flex">
+                <div class="break-word">{{ファイル名}}</div>
+                {{プレビュー}}
+                <div class="text-right ml-auto"></div>
+                {{目}}
+                <div class="ml-2 mt-1">
+                  <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="download" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-download p-0 pointer b-icon bi ban">
+                    <g>
+                      <path d="M.5 9.9a.5.5 0 0 1 .5.5v2.5a1 1 0 0 0 1 1h12a1 1 0 0 0 1-1v-2.5a.5.5 0 0 1 1 0v2.5a2 2 0 0 1-2 2H2a2 2 0 0 1-2-2v-2.5a.5.5 0 0 1 .5-.5z"></path>
+                      <path d="M7.646 11.854a.5.5 0 0 0 .708 0l3-3a.5.5 0 0 0-.708-.708L8.5 10.293V1.5a.5.5 0 0 0-1 0v8.793L5.354 8.146a.5.5 0 1 0-.708.708l3 3z"></path>
+                    </g>
+                  </svg>
+                  <a target="_blank" style="display: none;"></a>
+                </div>
+              </div>
+            </div>
+          </td>
+          <td class=""><div class="word-break m-0">{{登録日}}</div></td>
+          <td class=""><div class="word-break m-0">{{サイズ}}</div></td>
+        </tr>
+    """
+
+    file_eye_icon = """
+        <button type="button" class="btn p-0 btn-link">
+          <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="eye fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-eye-fill b-icon bi ban">
+            <g>
+              <path d="M10.5 8a2.5 2.5 0 1 1-5 0 2.5 2.5 0 0 1 5 0z"></path>
+              <path d="M0 8s3-5.5 8-5.5S16 8 16 8s-3 5.5-8 5.5S0 8 0 8zm8 3.5a3.5 3.5 0 1 0 0-7 3.5 3.5 0 0 0 0 7z"></path>
+            </g>
+          </svg>
+        </button>
+    """
+
     base_template = """
         <!DOCTYPE html>
         <html lang="en">
@@ -254,9 +1226,154 @@ def create_dataDetail(input_dir, out_root_dir, data_info, metadef_data, invsche_
           <meta data-hid="description" name="description" content="">
           <meta name="format-detection" content="telephone=no">
           <meta name="viewport" content="width=device-width, initial-scale=1">
-          <link rel="stylesheet" href="style.css">
+          <link rel="stylesheet" href="{{スタイルシート}}">
           <script defer>
+            var FILE_ROW_TEMPLATE = {{File_Row_Template}};
+            var FILE_EYE_ICON = {{File_Eye_Icon}};
+            var fileTable = {data: null, order: null, sort: null, desc: false, page: 0, pageSize: {{File_Page_Size}}};
+
+            function escapeHtml(text) {
+              return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+            }
+
+            function loadFiles() {
+              if (fileTable.data !== null || document.getElementById('file_script')) {
+                return;
+              }
+              var script = document.createElement('script');
+              script.id = 'file_script';
+              script.src = './files/{{データID}}.js';
+              document.head.appendChild(script);
+            }
+
+            function rdeFiles(data) {
+              fileTable.data = data;
+              fileTable.order = data.rows.map(function (row, i) { return i; });
+              renderFiles();
+            }
+
+            function sortFiles(key) {
+              if (fileTable.data === null) {
+                return;
+              }
+              var column = {kind: 0, name: 4, size: 3}[key];
+              var rows = fileTable.data.rows;
+              fileTable.desc = fileTable.sort === key ? !fileTable.desc : false;
+              fileTable.sort = key;
+              fileTable.order.sort(function (a, b) {
+                var diff = (rows[a][column] - rows[b][column]) || (rows[a][4] - rows[b][4]);
+                return fileTable.desc ? -diff : diff;
+              });
+              fileTable.page = 0;
+              renderFiles();
+            }
+
+            function pageFiles(step) {
+              if (fileTable.data === null) {
+                return;
+              }
+              var pages = Math.max(1, Math.ceil(fileTable.order.length / fileTable.pageSize));
+              fileTable.page = Math.min(pages - 1, Math.max(0, fileTable.page + step));
+              renderFiles();
+            }
+
+            function renderFiles() {
+              var data = fileTable.data;
+              var total = fileTable.order.length;
+              var start = fileTable.page * fileTable.pageSize;
+              var end = Math.min(total, start + fileTable.pageSize);
+              var html = '';
+              for (var p = start; p < end; p++) {
+                var i = fileTable.order[p];
+                var row = data.rows[i];
+                var values = {'No': i + 1, '種別': data.kinds[row[0]], 'ファイル名': escapeHtml(row[1]), '登録日': data.date,
+                              'サイズ': row[2], '目': data.eye[row[0]] ? FILE_EYE_ICON : '',
+                              'プレビュー': row[5] == null ? '' : '<span class="ml-2 text-muted small text-nowrap">' + row[5].toLocaleString() + ' 行</span><a class="ml-2 pointer text-primary small text-nowrap" onclick="togglePreview(' + i + ', this)">プレビュー</a>'};
+                html += FILE_ROW_TEMPLATE.replace(/\\{\\{([^}]+)\\}\\}/g, function (m, key) { return values[key]; });
+              }
+              document.getElementById('file_rows').innerHTML = html;
+              document.getElementById('file_pager').innerText = ' Showing ' + (total === 0 ? 0 : start + 1) + ' to ' + end + ' of ' + total + ' entries';
+              document.getElementById('file_page').innerText = (fileTable.page + 1) + ' / ' + Math.max(1, Math.ceil(total / fileTable.pageSize));
+            }
+
+            var filePreview = {data: null, pending: []};
+
+            function togglePreview(i, link) {
+              var tr = link.closest('tr');
+              var next = tr.nextElementSibling;
+              if (next && next.className === 'file-preview') {
+                next.parentNode.removeChild(next);
+                return;
+              }
+              if (filePreview.data === null) {
+                filePreview.pending.push([i, link]);
+                if (!document.getElementById('preview_script')) {
+                  var script = document.createElement('script');
+                  script.id = 'preview_script';
+                  script.src = './previews/{{データID}}.js';
+                  document.head.appendChild(script);
+                }
+                return;
+              }
+              var preview = filePreview.data[i];
+              var html = '<table class="table table-sm mb-0">';
+              preview.rows.forEach(function (row) {
+                html += '<tr>' + row.map(function (cell) { return '<td>' + escapeHtml(cell) + '</td>'; }).join('') + '</tr>';
+              });
+              html += '</table>';
+              if (preview.lines > preview.rows.length) {
+                html += '<div class="text-muted small">先頭 ' + preview.rows.length + ' 行を表示しています。(全 ' + preview.lines.toLocaleString() + ' 行)</div>';
+              }
+              tr.insertAdjacentHTML('afterend', '<tr class="file-preview"><td colspan="5"><div class="preview-box">' + html + '</div></td></tr>');
+            }
+
+            function rdePreviews(data) {
+              filePreview.data = data;
+              filePreview.pending.splice(0).forEach(function (p) { togglePreview(p[0], p[1]); });
+            }
+
+            var FRAGMENT_SRC = {files: './fragments/files', attachments: '{{Attachments_Src}}'};
+
+            function loadFragment(tabName) {
+              var tab = document.getElementById(tabName);
+              if (!FRAGMENT_SRC[tabName] || tab.getAttribute('data-src')) {
+                return;
+              }
+              var src = FRAGMENT_SRC[tabName];
+              tab.setAttribute('data-src', src);
+              var fallback = function () {
+                var script = document.createElement('script');
+                script.src = src + '.js';
+                document.head.appendChild(script);
+              };
+              if (window.fetch && /^https?:$/.test(window.location.protocol)) {
+                window.fetch(src + '.html').then(function (response) {
+                  if (!response.ok) {
+                    throw new Error(response.status);
+                  }
+                  return response.text();
+                }).then(function (html) {
+                  rdeFragment(tabName, html);
+                }).catch(fallback);
+              } else {
+                fallback();
+              }
+            }
+
+            function rdeFragment(tabName, html) {
+              var tab = document.getElementById(tabName);
+              if (tab.getAttribute('data-loaded')) {
+                return;
+              }
+              tab.setAttribute('data-loaded', 'true');
+              tab.innerHTML = html.split('{{File_Num}}').join('{{All_File_Num}}');
+              if (tabName === 'files') {
+                loadFiles();
+              }
+            }
+
             function switchTab(tabName) {
+              loadFragment(tabName);
               var tabs = ['summary', 'files', 'attachments'];
               tabs.forEach(function (tab) {
                 var tabElement = document.getElementById(`${tab}_tab`);
@@ -273,19 +1390,23 @@ def create_dataDetail(input_dir, out_root_dir, data_info, metadef_data, invsche_
               });
             }
 
-            function changeImg(imgPath) {
+            function changeImg(imgPath, imgName, tiles) {
               document.getElementById('topImg').src = imgPath;
-              document.getElementById('topImg_title').innerText = imgPath.split('/').pop();
+              document.getElementById('topImg_title').innerText = imgName;
+              if (typeof showTiles === 'function') {
+                showTiles(tiles);
+              }
             }
           </script>
+          {{タイル表示スクリプト}}
         </head>
         <body>
           <div>
             <div>
               <header class="header container px-0">
-                <h1 class="logo"><img src="https://rde.nims.go.jp/images/logo/RDE_logo.png"></h1>
+                <h1 class="logo"><img src="assets/RDE_logo.svg" alt="RDE"></h1>
                 <div class="menu">
-                  <a class="dicehome"><img src="https://rde.nims.go.jp/external/dice.png"></a>
+                  <a class="dicehome"><img src="assets/dice.svg" alt="DICE"></a>
                   <a class="register ban">ログアウト</a>
                 </div>
               </header>
@@ -391,282 +1512,14 @@ def create_dataDetail(input_dir, out_root_dir, data_info, metadef_data, invsche_
                           </div>
                         </div>
                       </div>
+                      {{グラフ}}
                     </div>
                   </div>
 
                   <div id="files" style="display: none;">
-                    <div class="row px-3">
-                      <div class="col-12">
-                        <div>
-                          <div>
-                            <table class="table table-sm mt-4 table-hover tableFixed">
-                              <thead>
-                                <tr>
-                                  <th class="align-middle" style="width: 6%;">
-                                    <div class="d-flex align-items-center">
-                                      <div>No.</div>
-                                      <div class="ml-auto h-100"></div>
-                                    </div>
-                                  </th>
-                                  <th class="align-middle" style="width: 25%;">
-                                    <div class="d-flex align-items-center ban">
-                                      <div>ファイル種別</div>
-                                      <div class="ml-auto h-100">
-                                        <div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -23)">
-                                                <g>
-                                                  <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -13)">
-                                                <g>
-                                                  <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                        </div>
-                                      </div>
-                                    </div>
-                                  </th>
-                                  <th class="align-middle" style="width: 34%;">
-                                    <div class="d-flex align-items-center ban">
-                                      <div>ファイル名</div>
-                                      <div class="ml-auto h-100">
-                                        <div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -23)">
-                                                <g>
-                                                  <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -13)">
-                                                <g>
-                                                  <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                        </div>
-                                      </div>
-                                    </div>
-                                  </th>
-                                  <th class="align-middle" style="width: 20%;">
-                                    <div class="d-flex align-items-center ban">
-                                      <div>ファイル登録日(JST)</div>
-                                      <div class="ml-auto h-100">
-                                        <div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -23)">
-                                                <g>
-                                                  <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -13)">
-                                                <g>
-                                                  <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                        </div>
-                                      </div>
-                                    </div>
-                                  </th>
-                                  <th class="align-middle" style="width: 15%;">
-                                    <div class="d-flex align-items-center ban">
-                                      <div>サイズ</div>
-                                      <div class="ml-auto h-100">
-                                        <div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -23)">
-                                                <g>
-                                                  <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -13)">
-                                                <g>
-                                                  <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                        </div>
-                                      </div>
-                                    </div>
-                                  </th>
-                                </tr>
-                              </thead>
-                              <tbody>
-                                {{Table_Files}}
-                              </tbody>
-                            </table>
-                          </div>
-                          <div class="pager container">
-                            <div class="row">
-                              <div class="col-6">
-                                <span> Showing 1 to {{All_File_Num}} of {{All_File_Num}} entries</span>
-                              </div>
-                            </div>
-                          </div>
-                        </div>
-                      </div>
-                    </div>
                   </div>
 
                   <div id="attachments" style="display: none;">
-                    <div class="row px-3">
-                      <div class="col-12">
-                        <div {{Table_Attachments_Display}}>
-                          <div>
-                            <table class="table table-sm mt-4 table-hover tableFixed">
-                              <thead>
-                                <tr>
-                                  <th class="align-middle" style="width: 6%;">
-                                    <div class="d-flex align-items-center">
-                                      <div>No.</div>
-                                      <div class="ml-auto h-100"></div>
-                                    </div>
-                                  </th>
-                                  <th class="align-middle" style="width: 34%;">
-                                    <div class="d-flex align-items-center ban">
-                                      <div>ファイル名</div>
-                                      <div class="ml-auto h-100">
-                                        <div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -23)">
-                                                <g>
-                                                  <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg></div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false"  role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -13)">
-                                                <g>
-                                                  <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                        </div>
-                                      </div>
-                                    </div>
-                                  </th>
-                                  <th class="align-middle" style="width: 20%;">
-                                    <div class="d-flex align-items-center ban">
-                                      <div>ファイル登録日(JST)</div>
-                                      <div class="ml-auto h-100">
-                                        <div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -23)">
-                                                <g>
-                                                  <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -13)">
-                                                <g>
-                                                  <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                        </div>
-                                      </div>
-                                    </div>
-                                  </th>
-                                  <th class="align-middle" style="width: 15%;">
-                                    <div class="d-flex align-items-center ban">
-                                      <div>サイズ</div>
-                                      <div class="ml-auto h-100">
-                                        <div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -23)">
-                                                <g>
-                                                  <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -13)">
-                                                <g>
-                                                  <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                        </div>
-                                      </div>
-                                    </div>
-                                  </th>
-                                  <th class="align-middle" style="width: 25%;">
-                                    <div class="d-flex align-items-center ban">
-                                      <div>説明</div>
-                                      <div class="ml-auto h-100">
-                                        <div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -23)">
-                                                <g>
-                                                  <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                          <div class="h-0px">
-                                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
-                                              <g transform="translate(0 -13)">
-                                                <g>
-                                                  <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
-                                                </g>
-                                              </g>
-                                            </svg>
-                                          </div>
-                                        </div>
-                                      </div>
-                                    </div>
-                                  </th>
-                                  <th style="width: 100px;"></th>
-                                </tr>
-                              </thead>
-                              <tbody>
-                                {{Table_Attachments}}
-                              </tbody>
-                            </table>
-                          </div>
-                        </div>
-                      </div>
-                    </div>
                   </div>
                 </div>
                 <div class="py-5">
@@ -679,8 +1532,8 @@ def create_dataDetail(input_dir, out_root_dir, data_info, metadef_data, invsche_
                       </div>
                     </div>
                     <div class="row">
-                      <a><img src="https://rde.nims.go.jp/sample_files/dice399-46.png" alt="国立研究開発法人物質・材料研究機構"></a>
-                      <a><img src="https://rde.nims.go.jp/sample_files/rde2_logo_arim.png" alt="マテリアル先端リサーチインフラ事業"></a>
+                      <a><img src="assets/dice_nims.svg" alt="国立研究開発法人物質・材料研究機構"></a>
+                      <a><img src="assets/arim.svg" alt="マテリアル先端リサーチインフラ事業"></a>
                     </div>
                   </div>
                 </div>
@@ -708,367 +1561,1295 @@ def create_dataDetail(input_dir, out_root_dir, data_info, metadef_data, invsche_
         </html>
     """
 
-    for d in data_info:
+    # ファイルタブ(全データ共通、件数はブラウザ側で置き換える)
+    files_fragment = """
+        <div class="row px-3">
+          <div class="col-12">
+            <div>
+              <div>
+                <table class="table table-sm mt-4 table-hover tableFixed">
+                  <thead>
+                    <tr>
+                      <th class="align-middle" style="width: 6%;">
+                        <div class="d-flex align-items-center">
+                          <div>No.</div>
+                          <div class="ml-auto h-100"></div>
+                        </div>
+                      </th>
+                      <th class="align-middle" style="width: 25%;">
+                        <div id="sort_kind" class="d-flex align-items-center pointer" onclick="sortFiles('kind')">
+                          <div>ファイル種別</div>
+                          <div class="ml-auto h-100">
+                            <div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -23)">
+                                    <g>
+                                      <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -13)">
+                                    <g>
+                                      <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                            </div>
+                          </div>
+                        </div>
+                      </th>
+                      <th class="align-middle" style="width: 34%;">
+                        <div id="sort_name" class="d-flex align-items-center pointer" onclick="sortFiles('name')">
+                          <div>ファイル名</div>
+                          <div class="ml-auto h-100">
+                            <div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -23)">
+                                    <g>
+                                      <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -13)">
+                                    <g>
+                                      <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                            </div>
+                          </div>
+                        </div>
+                      </th>
+                      <th class="align-middle" style="width: 20%;">
+                        <div class="d-flex align-items-center ban">
+                          <div>ファイル登録日(JST)</div>
+                          <div class="ml-auto h-100">
+                            <div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -23)">
+                                    <g>
+                                      <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -13)">
+                                    <g>
+                                      <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                            </div>
+                          </div>
+                        </div>
+                      </th>
+                      <th class="align-middle" style="width: 15%;">
+                        <div id="sort_size" class="d-flex align-items-center pointer" onclick="sortFiles('size')">
+                          <div>サイズ</div>
+                          <div class="ml-auto h-100">
+                            <div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -23)">
+                                    <g>
+                                      <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -13)">
+                                    <g>
+                                      <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                            </div>
+                          </div>
+                        </div>
+                      </th>
+                    </tr>
+                  </thead>
+                  <tbody id="file_rows">
+                  </tbody>
+                </table>
+              </div>
+              <div class="pager container">
+                <div class="row">
+                  <div class="col-6">
+                    <span id="file_pager"> Showing 0 to 0 of {{File_Num}} entries</span>
+                  </div>
+                  <div class="col-6 text-right">
+                    <button type="button" class="btn btn-secondary btn-sm" onclick="pageFiles(-1)">&lt;</button>
+                    <span id="file_page" class="mx-2"></span>
+                    <button type="button" class="btn btn-secondary btn-sm" onclick="pageFiles(1)">&gt;</button>
+                  </div>
+                </div>
+              </div>
+            </div>
+          </div>
+        </div>
+    """
+
+    # 添付ファイルタブ
+    attachments_fragment = """
+        <div class="row px-3">
+          <div class="col-12">
+            <div {{Table_Attachments_Display}}>
+              <div>
+                <table class="table table-sm mt-4 table-hover tableFixed">
+                  <thead>
+                    <tr>
+                      <th class="align-middle" style="width: 6%;">
+                        <div class="d-flex align-items-center">
+                          <div>No.</div>
+                          <div class="ml-auto h-100"></div>
+                        </div>
+                      </th>
+                      <th class="align-middle" style="width: 34%;">
+                        <div class="d-flex align-items-center ban">
+                          <div>ファイル名</div>
+                          <div class="ml-auto h-100">
+                            <div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -23)">
+                                    <g>
+                                      <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg></div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false"  role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -13)">
+                                    <g>
+                                      <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                            </div>
+                          </div>
+                        </div>
+                      </th>
+                      <th class="align-middle" style="width: 20%;">
+                        <div class="d-flex align-items-center ban">
+                          <div>ファイル登録日(JST)</div>
+                          <div class="ml-auto h-100">
+                            <div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -23)">
+                                    <g>
+                                      <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -13)">
+                                    <g>
+                                      <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                            </div>
+                          </div>
+                        </div>
+                      </th>
+                      <th class="align-middle" style="width: 15%;">
+                        <div class="d-flex align-items-center ban">
+                          <div>サイズ</div>
+                          <div class="ml-auto h-100">
+                            <div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -23)">
+                                    <g>
+                                      <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -13)">
+                                    <g>
+                                      <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                            </div>
+                          </div>
+                        </div>
+                      </th>
+                      <th class="align-middle" style="width: 25%;">
+                        <div class="d-flex align-items-center ban">
+                          <div>説明</div>
+                          <div class="ml-auto h-100">
+                            <div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret up fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-up-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -23)">
+                                    <g>
+                                      <path d="M7.247 4.86l-4.796 5.481c-.566.647-.106 1.659.753 1.659h9.592a1 1 0 0 0 .753-1.659l-4.796-5.48a1 1 0 0 0-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                              <div class="h-0px">
+                                <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="caret down fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-caret-down-fill b-icon bi" style="font-size: 70%;">
+                                  <g transform="translate(0 -13)">
+                                    <g>
+                                      <path d="M7.247 11.14L2.451 5.658C1.885 5.013 2.345 4 3.204 4h9.592a1 1 0 0 1 .753 1.659l-4.796 5.48a1 1 0 0 1-1.506 0z"></path>
+                                    </g>
+                                  </g>
+                                </svg>
+                              </div>
+                            </div>
+                          </div>
+                        </div>
+                      </th>
+                      <th style="width: 100px;"></th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {{Table_Attachments}}
+                  </tbody>
+                </table>
+              </div>
+            </div>
+          </div>
+        </div>
+    """
+
+    # タイルに分割した画像の表示(ホイールで拡大・縮小、ドラッグで移動、ダブルクリックで元に戻す)
+    tile_script = """
+        <script>
+          var tileView = null;
+
+          function showTiles(tiles) {
+            var img = document.getElementById('topImg');
+            var box = document.getElementById('topTiles');
+            if (!box) {
+              return;
+            }
+            if (!tiles) {
+              img.style.display = '';
+              box.style.display = 'none';
+              tileView = null;
+              return;
+            }
+            img.style.display = 'none';
+            box.style.display = '';
+            box.innerHTML = '';
+            var fit = Math.min(box.clientWidth / tiles[1], box.clientHeight / tiles[2]);
+            var base = document.createElement('img');
+            base.className = 'tile';
+            base.src = tileUrl(tiles, tiles[3] - 1, 0, 0);
+            box.appendChild(base);
+            tileView = {tiles: tiles, box: box, base: base, fit: fit, scale: fit, x: (box.clientWidth - tiles[1] * fit) / 2, y: (box.clientHeight - tiles[2] * fit) / 2, shown: {}};
+            box.onwheel = zoomTiles;
+            box.onmousedown = dragTiles;
+            box.ondblclick = function () { showTiles(tileView.tiles); };
+            renderTiles();
+          }
+
+          function tileUrl(tiles, level, col, row) {
+            return tiles[0] + '/' + level + '/' + col + '_' + row + '.jpg';
+          }
+
+          function renderTiles() {
+            var v = tileView;
+            var size = v.tiles[4];
+            var level = Math.max(0, Math.min(v.tiles[3] - 1, Math.floor(Math.log2(1 / v.scale))));
+            var factor = Math.pow(2, level);
+            var width = Math.ceil(v.tiles[1] / factor);
+            var height = Math.ceil(v.tiles[2] / factor);
+            var s = v.scale * factor;
+            v.base.style.cssText = 'left:' + Math.round(v.x) + 'px;top:' + Math.round(v.y) + 'px;width:' + Math.round(v.tiles[1] * v.scale) + 'px;height:' + Math.round(v.tiles[2] * v.scale) + 'px;';
+            var col0 = Math.max(0, Math.floor(-v.x / s / size));
+            var col1 = Math.min(Math.ceil(width / size) - 1, Math.floor((v.box.clientWidth - v.x) / s / size));
+            var row0 = Math.max(0, Math.floor(-v.y / s / size));
+            var row1 = Math.min(Math.ceil(height / size) - 1, Math.floor((v.box.clientHeight - v.y) / s / size));
+            var keep = {};
+            for (var row = row0; row <= row1; row++) {
+              for (var col = col0; col <= col1; col++) {
+                var key = level + '/' + col + '_' + row;
+                var tile = v.shown[key];
+                if (!tile) {
+                  tile = document.createElement('img');
+                  tile.className = 'tile';
+                  tile.src = tileUrl(v.tiles, level, col, row);
+                  v.box.appendChild(tile);
+                  v.shown[key] = tile;
+                }
+                keep[key] = true;
+                var left = Math.round(v.x + col * size * s);
+                var top = Math.round(v.y + row * size * s);
+                tile.style.cssText = 'left:' + left + 'px;top:' + top + 'px;width:' + (Math.round(v.x + Math.min((col + 1) * size, width) * s) - left) + 'px;height:' + (Math.round(v.y + Math.min((row + 1) * size, height) * s) - top) + 'px;';
+              }
+            }
+            for (var k in v.shown) {
+              if (!keep[k]) {
+                v.box.removeChild(v.shown[k]);
+                delete v.shown[k];
+              }
+            }
+          }
+
+          function zoomTiles(e) {
+            var v = tileView;
+            e.preventDefault();
+            var rect = v.box.getBoundingClientRect();
+            var mx = e.clientX - rect.left;
+            var my = e.clientY - rect.top;
+            var scale = Math.max(v.fit, Math.min(4, v.scale * (e.deltaY < 0 ? 1.25 : 0.8)));
+            v.x = mx - (mx - v.x) * scale / v.scale;
+            v.y = my - (my - v.y) * scale / v.scale;
+            v.scale = scale;
+            renderTiles();
+          }
+
+          function dragTiles(e) {
+            var v = tileView;
+            e.preventDefault();
+            var sx = e.clientX - v.x;
+            var sy = e.clientY - v.y;
+            document.onmousemove = function (e) {
+              v.x = e.clientX - sx;
+              v.y = e.clientY - sy;
+              renderTiles();
+            };
+            document.onmouseup = function () {
+              document.onmousemove = null;
+              document.onmouseup = null;
+            };
+          }
+
+          document.addEventListener('DOMContentLoaded', function () {
+            var box = document.getElementById('topTiles');
+            if (box && box.dataset.tiles) {
+              showTiles(JSON.parse(box.dataset.tiles));
+            }
+          });
+        </script>
+    """
+
+    write_fragment(out_sink, "files", files_fragment)
+
+    base_template = base_template.replace("{{スタイルシート}}", STYLE_FILE)
+
+    # ブラウザ側で表示する場合は、共通の表示用ページを1つだけ出力する
+    if DETAIL_MODE == "viewer":
+        create_viewer(out_sink, base_template.replace("{{タイル表示スクリプト}}", tile_script), file_row_template, file_eye_icon)
+
+    base_fingerprint = get_fingerprint([metadef_data, invsche_data, STYLE_FILE, COMPRESS, FILE_PAGE_SIZE, DETAIL_MODE,
+                                        TEXT_PREVIEW_SUFFIXES, TEXT_PREVIEW_ROWS, TEXT_PREVIEW_BYTES, CHART_STRUCTURED, CHART_POINTS, CHART_MAX_FILES,
+                                        VARIABLE_COLUMNS_MAX, VARIABLE_CHART_POINTS])
+    skipped = 0
+    cache = FragmentCache(FRAGMENT_CACHE_SIZE)
+    for n, d in enumerate(data_info):
+        # 作成状況の通知
+        if progress is not None:
+            progress(n)
+
         # 出力ファイル名
-        out_html_file = out_root_dir.joinpath(f"{d['id']}.html")
+        out_html_file = f"{d['id']}.html"
 
-        # 試料ID
-        if len(d["invoice"]["sample"]["names"]) > 0:
-            sample_id = d["invoice"]["sample"]["names"][0]
-        else:
-            sample_id = d["invoice"]["sample"]["sampleId"]
+        # 1件のデータの不備で全体が止まらないように、失敗した場合はエラーページを出力して続ける
+        if d.get("errors"):
+            create_errorPage(out_sink, d)
+            continue
 
-        # データ名
-        if d["invoice"]["basic"]["dataName"]:
-            dataname = d["invoice"]["basic"]["dataName"]
-        else:
-            dataname = f"プレビュー_{d['id']}"
-
-        # 出現するメタデータの全項目
-        metakeys  = list(d["metadata"]["constant"].keys())
-        metakeys += list(set([key for v in d["metadata"]["variable"] for key in v.keys()]))
-        metakeys  = sort_meta(metadef_data, metakeys)
-
-        # variableメタの数(テーブルの値の列数)
-        metalen = len(d["metadata"]["variable"])
-        if metalen == 0:
-            metalen = 1
-
-        # テーブルの値の列数
-        column_value = "\n".join([f'<th class="w-200px">値{i}</th>' for i in range(1, metalen+1)])
-
-        if (len(d["files"].get("main_image", [])) + len(d["files"].get("other_image", []))) == 0:
-            top_img = """
-                <div class="border d-flex align-items-center justify-content-center no-image gray" style="width: 500px; height: 350px;">
-                  <div class="text-left" style="font-size: 5rem; line-height: 6rem;">
-                    <div>No</div>
-                    <div>Image</div>
-                  </div>
-                </div>
-                <div class="text-center main-image-box-width break-word"><span id="topImg_title"></span></div>
-            """
+        # 前回作成済みで入力が変わっていないページはスキップする
+        # (カタログから読み込んだ場合は空のフォルダが含まれないため、空のフォルダは除いて比べる)
+        fingerprint = get_fingerprint([base_fingerprint, d["invoice"], d["metadata"], {dr:fs for dr, fs in d["files"].items() if fs}])
+        if out_sink.get_done("detail", d["id"], fingerprint) is not None:
+            skipped += 1
+            continue
+        out_sink.begin("detail", d["id"], fingerprint)
+
+        try:
+            # 試料ID
+            sample_id = get_sample_id(d)
+
+            # データ名
+            dataname = get_dataname(d)
+
+            # 出現するメタデータの全項目
+            metakeys  = list(d["metadata"]["constant"].keys())
+            metakeys += list(set([key for v in d["metadata"]["variable"] for key in v.keys()]))
+            metakeys  = sort_meta(metadef_data, metakeys)
+
+            # variableメタの数(テーブルの値の列数)
+            metalen = len(d["metadata"]["variable"])
+            if metalen == 0 or metalen > VARIABLE_COLUMNS_MAX:
+                metalen = 1
+
+            counter_files = create_file_list(out_sink, d, filedirs)
+            charts = create_charts(d)
+
+            counter_attachments = 0
+            attachments = ""
+            for f in d["files"].get("attachment", []):
+                counter_attachments += 1
+                attachments += f"""
+                  <tr>
+                    <td><div class="word-break m-0">{counter_attachments}</div></td>
+                    <td>
+                      <div>
+                        <div class="d-flex">
+                          <div class="break-word">{f['name']}</div>
+                          <div class="text-right ml-auto"></div>
+                          <div class="ml-2 mt-1">
+                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="download" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-download p-0 pointer b-icon bi ban">
+                              <g>
+                                <path d="M.5 9.9a.5.5 0 0 1 .5.5v2.5a1 1 0 0 0 1 1h12a1 1 0 0 0 1-1v-2.5a.5.5 0 0 1 1 0v2.5a2 2 0 0 1-2 2H2a2 2 0 0 1-2-2v-2.5a.5.5 0 0 1 .5-.5z"></path><path d="M7.646 11.854a.5.5 0 0 0 .708 0l3-3a.5.5 0 0 0-.708-.708L8.5 10.293V1.5a.5.5 0 0 0-1 0v8.793L5.354 8.146a.5.5 0 1 0-.708.708l3 3z"></path>
+                              </g>
+                            </svg>
+                          </div>
+                        </div>
+                      </div>
+                    </td>
+                    <td><div class="word-break m-0">{d['invoice']['basic']['dateSubmitted']}</div></td>
+                    <td><div class="word-break m-0">{f['size']}</div></td>
+                    <td><div class="word-break m-0"></div></td>
+                    <td class="text-center">
+                      <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="trash fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-trash-fill pointer b-icon bi ban" style="font-size: 150%;">
+                        <g>
+                          <path d="M2.5 1a1 1 0 0 0-1 1v1a1 1 0 0 0 1 1H3v9a2 2 0 0 0 2 2h6a2 2 0 0 0 2-2V4h.5a1 1 0 0 0 1-1V2a1 1 0 0 0-1-1H10a1 1 0 0 0-1-1H7a1 1 0 0 0-1 1H2.5zm3 4a.5.5 0 0 1 .5.5v7a.5.5 0 0 1-1 0v-7a.5.5 0 0 1 .5-.5zM8 5a.5.5 0 0 1 .5.5v7a.5.5 0 0 1-1 0v-7A.5.5 0 0 1 8 5zm3 .5v7a.5.5 0 0 1-1 0v-7a.5.5 0 0 1 1 0z"></path>
+                        </g>
+                      </svg>
+                    </td>
+                  </tr>
+                  """
 
-            carousel = """
-                <div class="thumbnail-position px-1">
-                  <div class="border d-flex align-items-center justify-content-center no-image gray" style="width: 120px; height: 80px;">
-                    <div class="text-left" style="font-size: 1.2rem; line-height: 1.44rem;">
-                      <div>No</div>
-                      <div>Image</div>
+            if counter_attachments == 0:
+                attachments_display = 'style="display: none;"'
+            else:
+                attachments_display = ""
+
+            # 添付ファイルがある場合のみ別ファイルに出力し、タブを開いたときに読み込む
+            if counter_attachments == 0:
+                attachments_src = ""
+            else:
+                attachments_src = f"./fragments/{d['id']}.attachments"
+                fragment = attachments_fragment.replace("{{Table_Attachments_Display}}", attachments_display)
+                fragment = fragment.replace("{{Table_Attachments}}", attachments)
+                write_fragment(out_sink, f"{d['id']}.attachments", fragment)
+
+            # ブラウザ側で表示する場合は、データごとにjsだけを出力する
+            if DETAIL_MODE == "viewer":
+                create_entryData(out_sink, d, metadef_data, invsche_data, terms, metakeys, metalen, counter_files, counter_attachments, attachments_src, charts)
+                out_sink.commit()
+                continue
+
+            # テーブルの値の列数
+            column_value = "\n".join([f'<th class="w-200px">値{i}</th>' for i in range(1, metalen+1)])
+
+            if len(get_images(d)) == 0:
+                top_img = """
+                    <div class="border d-flex align-items-center justify-content-center no-image gray" style="width: 500px; height: 350px;">
+                      <div class="text-left" style="font-size: 5rem; line-height: 6rem;">
+                        <div>No</div>
+                        <div>Image</div>
+                      </div>
                     </div>
-                  </div>
-                </div>
-            """
-        else:
-            top_img  = ""
-            carousel = ""
-            for m in ["main_image", "other_image"]:
-                for img in d["files"].get(m, []):
-                    img_path = f"./images/{d['id']}/{m}/{img['name']}"
-
-                    if top_img == "":
-                        top_img = f"""
-                            <div class="border p-2">
-                              <div class="d-flex align-items-center justify-content-center main-image-box">
-                                <img id="topImg" class="main-image" src="{img_path}">
+                    <div class="text-center main-image-box-width break-word"><span id="topImg_title"></span></div>
+                """
+
+                carousel = """
+                    <div class="thumbnail-position px-1">
+                      <div class="border d-flex align-items-center justify-content-center no-image gray" style="width: 120px; height: 80px;">
+                        <div class="text-left" style="font-size: 1.2rem; line-height: 1.44rem;">
+                          <div>No</div>
+                          <div>Image</div>
+                        </div>
+                      </div>
+                    </div>
+                """
+            else:
+                top_img  = ""
+                carousel = ""
+                for m in ["main_image", "other_image"]:
+                    for img in d["files"].get(m, []):
+                        # 読み込み・コピーに失敗した画像は表示しない
+                        if "path" not in img:
+                            continue
+                        # タイルに分割した画像は、元の画像の代わりに最も縮小したタイルを表示する
+                        img_path = get_tile_preview(img) or get_image_path(d, m, img)
+                        tiles = html_escape(json.dumps(img["tiles"])) if img.get("tiles") else "null"
+
+                        if top_img == "":
+                            top_img = f"""
+                                <div class="border p-2">
+                                  <div class="d-flex align-items-center justify-content-center main-image-box">
+                                    <img id="topImg" class="main-image" src="{img_path}"{get_image_attrs(img)}>
+                                    {{{{タイル表示}}}}
+                                  </div>
+                                </div>
+                                <div class="text-center main-image-box-width break-word"><span id="topImg_title">{img['name']}</span></div>
+                            """
+                            top_tiles = tiles if img.get("tiles") else ""
+
+                        carousel += f"""
+                            <div class="thumbnail-position px-1 pointer">
+                              <div class="text-center d-flex align-items-center justify-content-center image-box" onclick="changeImg('{img_path}', this.nextElementSibling.innerText, {tiles})">
+                                <img id="thumbImg" class="image2" src="{img_path}"{get_image_attrs(img)} loading="lazy">
                               </div>
+                              <div class="text-center image-box-width break-word">{img['name']}</div>
                             </div>
-                            <div class="text-center main-image-box-width break-word"><span id="topImg_title">{img['name']}</span></div>
                         """
 
-                    carousel += f"""
-                        <div class="thumbnail-position px-1 pointer">
-                          <div class="text-center d-flex align-items-center justify-content-center image-box" onclick="changeImg('{img_path}')">
-                            <img id="thumbImg" class="image2" src="{img_path}">
-                          </div>
-                          <div class="text-center image-box-width break-word">{img['name']}</div>
-                        </div>
-                    """
+            basic = f"""
+                <tr>
+                  <td>基本情報</td>
+                  <td>記入年月日</td>
+                  <td>Date of Data Entry</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">{d['invoice']['basic']['dateSubmitted']} JST</td>
+                </tr>
+                <tr>
+                  <td></td>
+                  <td>データ所有者(所属)</td>
+                  <td>Data Owner (Affiliation)</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">プレビューユーザ</td>
+                </tr>
+                <tr>
+                  <td></td>
+                  <td>データ名</td>
+                  <td>Data Name</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">{dataname}</td>
+                </tr>
+                <tr>
+                  <td></td>
+                  <td>実験ID</td>
+                  <td>Experiment ID</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">{get_value(d['invoice']['basic']['experimentId'])}</td>
+                </tr>
+                <tr>
+                  <td></td>
+                  <td>説明</td>
+                  <td>Description</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">{get_value(d['invoice']['basic']['description'])}</td>
+                </tr>
+            """
+
+            instrument = f"""
+                <tr>
+                  <td>装置情報</td>
+                  <td>登録名</td>
+                  <td>Registration Name</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">**プレビューでは非表示**</td>
+                </tr>
+                <tr>
+                  <td></td>
+                  <td>機関</td>
+                  <td>Organization</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">**プレビューでは非表示**</td>
+                </tr>
+                <tr>
+                  <td></td>
+                  <td>説明</td>
+                  <td>Description</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">**プレビューでは非表示**</td>
+                </tr>
+            """
+
+            # 試料・固有情報の行は同じ試料や条件のデータで共通になることが多いため、キャッシュから使い回す
+            composition = get_value(d['invoice']['sample']['composition'])
+            description = get_value(d['invoice']['sample']['description'])
+            sample = cache.get(("sample", sample_id, composition, description, metalen), lambda: f"""
+                <tr>
+                  <td>試料情報</td>
+                  <td>試料名(ローカルID)</td>
+                  <td>Sample Name (Local ID)</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">{sample_id}</td>
+                </tr>
+                <tr>
+                  <td></td>
+                  <td>化学式・組成式・分子式など</td>
+                  <td>Chemical Formula etc.</td>
+                  <td></td>
+                  <td colspan="{metalen}" class="break-word white-space-pre-line">{composition}</td>
+                </tr>
+                <tr>
+                  <td></td>
+                  <td>試料の説明</td>
+                  <td>Description</td>
+                  <td></td>
+                  <td colspan="{metalen}" class=""><div class="css-reset">{description}</div></td>
+                </tr>
+            """)
+
+            label = OneTimeUse("固有情報")
+            meta = ""
+            for k in metakeys:
+                if metadef_data[k].get("variable", 2) == 2:
+                    if d['metadata']['constant'].get(k, False):
+                        row_label = str(label)
+                        unit = get_value(d['metadata']['constant'][k].get('unit'), metadef_data[k].get('unit', ''))
+                        value = get_value(d['metadata']['constant'][k]["value"])
+                        meta += cache.get(("constant", k, row_label, unit, value, metalen), lambda: f"""
+                            <tr>
+                              <td>{row_label}</td>
+                              <td>{get_value(metadef_data[k]['name']['ja'])}</td>
+                              <td>{get_value(metadef_data[k]['name']['en'])}</td>
+                              <td>{unit}</td>
+                              <td colspan="{metalen}" class="break-word white-space-pre-line">{value}</td>
+                            </tr>
+                        """)
+                else:
+                    unit = metadef_data[k].get('unit', '')
+                    for v in d['metadata']['variable']:
+                        kunit = v.get(k, {'unit':None}).get('unit', None)
+                        if kunit:
+                            unit = kunit
+                            break
 
-        basic = f"""
-            <tr>
-              <td>基本情報</td>
-              <td>記入年月日</td>
-              <td>Date of Data Entry</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">{d['invoice']['basic']['dateSubmitted']} JST</td>
-            </tr>
-            <tr>
-              <td></td>
-              <td>データ所有者(所属)</td>
-              <td>Data Owner (Affiliation)</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">プレビューユーザ</td>
-            </tr>
-            <tr>
-              <td></td>
-              <td>データ名</td>
-              <td>Data Name</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">{dataname}</td>
-            </tr>
-            <tr>
-              <td></td>
-              <td>実験ID</td>
-              <td>Experiment ID</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">{get_value(d['invoice']['basic']['experimentId'])}</td>
-            </tr>
-            <tr>
-              <td></td>
-              <td>説明</td>
-              <td>Description</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">{get_value(d['invoice']['basic']['description'])}</td>
-            </tr>
-        """
-
-        instrument = f"""
-            <tr>
-              <td>装置情報</td>
-              <td>登録名</td>
-              <td>Registration Name</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">**プレビューでは非表示**</td>
-            </tr>
-            <tr>
-              <td></td>
-              <td>機関</td>
-              <td>Organization</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">**プレビューでは非表示**</td>
-            </tr>
-            <tr>
-              <td></td>
-              <td>説明</td>
-              <td>Description</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">**プレビューでは非表示**</td>
-            </tr>
-        """
-
-        sample = f"""
-            <tr>
-              <td>試料情報</td>
-              <td>試料名(ローカルID)</td>
-              <td>Sample Name (Local ID)</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">{sample_id}</td>
-            </tr>
-            <tr>
-              <td></td>
-              <td>化学式・組成式・分子式など</td>
-              <td>Chemical Formula etc.</td>
-              <td></td>
-              <td colspan="{metalen}" class="break-word white-space-pre-line">{get_value(d['invoice']['sample']['composition'])}</td>
-            </tr>
-            <tr>
-              <td></td>
-              <td>試料の説明</td>
-              <td>Description</td>
-              <td></td>
-              <td colspan="{metalen}" class=""><div class="css-reset">{get_value(d['invoice']['sample']['description'])}</div></td>
-            </tr>
-        """
-
-        label = OneTimeUse("固有情報")
-        meta = ""
-        for k in metakeys:
-            if metadef_data[k].get("variable", 2) == 2:
-                if d['metadata']['constant'].get(k, False):
                     meta += f"""
                         <tr>
                           <td>{label}</td>
                           <td>{get_value(metadef_data[k]['name']['ja'])}</td>
                           <td>{get_value(metadef_data[k]['name']['en'])}</td>
-                          <td>{get_value(d['metadata']['constant'][k].get('unit'), metadef_data[k].get('unit', ''))}</td>
-                          <td colspan="{metalen}" class="break-word white-space-pre-line">{get_value(d['metadata']['constant'][k]["value"])}</td>
-                        </tr>
+                          <td>{unit}</td>
                     """
+                    if len(d['metadata']['variable']) > VARIABLE_COLUMNS_MAX:
+                        meta += f"<td colspan='1' class='break-word white-space-pre-line'>{get_variable_cell(d, k)}</td>"
+                    else:
+                        for v in d['metadata']['variable']:
+                            meta += f"<td colspan='1' class='break-word white-space-pre-line'>{get_value(v.get(k, {'value':None})['value'])}</td>"
+
+                    meta += "</tr>"
+
+            for k in d["invoice"].get("custom", []):
+                if d["invoice"]["custom"][k]:
+                    row_label = str(label)
+                    value = get_value(d["invoice"]["custom"][k])
+                    meta += cache.get(("custom", k, row_label, value, metalen), lambda: f"""
+                        <tr>
+                          <td>{row_label}</td>
+                          <td>{invsche_data['properties']['custom']['properties'][k]['label']['ja']}
+                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="file earmark text fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-file-earmark-text-fill b-icon bi">
+                              <g>
+                                <path d="M9.293 0H4a2 2 0 0 0-2 2v12a2 2 0 0 0 2 2h8a2 2 0 0 0 2-2V4.707A1 1 0 0 0 13.707 4L10 .293A1 1 0 0 0 9.293 0zM9.5 3.5v-2l3 3h-2a1 1 0 0 1-1-1zM4.5 9a.5.5 0 0 1 0-1h7a.5.5 0 0 1 0 1h-7zM4 10.5a.5.5 0 0 1 .5-.5h7a.5.5 0 0 1 0 1h-7a.5.5 0 0 1-.5-.5zm.5 2.5a.5.5 0 0 1 0-1h4a.5.5 0 0 1 0 1h-4z"></path>
+                              </g>
+                            </svg>
+                          </td>
+                          <td>{invsche_data['properties']['custom']['properties'][k]['label']['en']}</td>
+                          <td>{invsche_data['properties']['custom']['properties'][k].get('options', {}).get('unit', "")}</td>
+                          <td colspan="{metalen}" class="break-word white-space-pre-line">{value}</td>
+                        </tr>
+                    """)
+
+            for k in d["invoice"].get("sample", {}).get("generalAttributes", []):
+                if k["value"]:
+                    row_label = str(label)
+                    value = get_value(k["value"])
+                    meta += cache.get(("general", k["termId"], row_label, value, metalen), lambda: f"""
+                        <tr>
+                          <td>{row_label}</td>
+                          <td>{terms.general_sample_term.get(k['termId'], {}).get('ja', '')}
+                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="file earmark text fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-file-earmark-text-fill b-icon bi">
+                              <g>
+                                <path d="M9.293 0H4a2 2 0 0 0-2 2v12a2 2 0 0 0 2 2h8a2 2 0 0 0 2-2V4.707A1 1 0 0 0 13.707 4L10 .293A1 1 0 0 0 9.293 0zM9.5 3.5v-2l3 3h-2a1 1 0 0 1-1-1zM4.5 9a.5.5 0 0 1 0-1h7a.5.5 0 0 1 0 1h-7zM4 10.5a.5.5 0 0 1 .5-.5h7a.5.5 0 0 1 0 1h-7a.5.5 0 0 1-.5-.5zm.5 2.5a.5.5 0 0 1 0-1h4a.5.5 0 0 1 0 1h-4z"></path>
+                              </g>
+                            </svg>
+                          </td>
+                          <td>{terms.general_sample_term.get(k['termId'], {}).get('en', '')}</td>
+                          <td></td>
+                          <td colspan="{metalen}" class="break-word white-space-pre-line">{value}</td>
+                        </tr>
+                    """)
+
+            for k in d["invoice"].get("sample", {}).get("specificAttributes",[]):
+                if k["value"]:
+                    row_label = str(label)
+                    value = get_value(k["value"])
+                    meta += cache.get(("specific", k["classId"], k["termId"], row_label, value, metalen), lambda: f"""
+                        <tr>
+                          <td>{row_label}</td>
+                          <td>{terms.sample_class.get(k['classId'], {}).get('ja', k['classId'])} / {terms.specific_sample_term.get(k['termId'], {}).get('ja', k['termId'])}
+                            <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="file earmark text fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-file-earmark-text-fill b-icon bi">
+                              <g>
+                                <path d="M9.293 0H4a2 2 0 0 0-2 2v12a2 2 0 0 0 2 2h8a2 2 0 0 0 2-2V4.707A1 1 0 0 0 13.707 4L10 .293A1 1 0 0 0 9.293 0zM9.5 3.5v-2l3 3h-2a1 1 0 0 1-1-1zM4.5 9a.5.5 0 0 1 0-1h7a.5.5 0 0 1 0 1h-7zM4 10.5a.5.5 0 0 1 .5-.5h7a.5.5 0 0 1 0 1h-7a.5.5 0 0 1-.5-.5zm.5 2.5a.5.5 0 0 1 0-1h4a.5.5 0 0 1 0 1h-4z"></path>
+                              </g>
+                            </svg>
+                          </td>
+                          <td>{terms.sample_class.get(k['classId'], {}).get('en', k['classId'])} / {terms.specific_sample_term.get(k['termId'], {}).get('en', k['termId'])}</td>
+                          <td></td>
+                          <td colspan="{metalen}" class="break-word white-space-pre-line">{value}</td>
+                        </tr>
+                    """)
+
+            # タイルに分割した画像がある場合のみ、表示用の要素とスクリプトを入れる
+            has_tiles = any(img.get("tiles") for m, img in get_images(d))
+            if has_tiles:
+                top_img = top_img.replace("{{タイル表示}}", f'<div id="topTiles" class="main-image tile-viewer" style="display: none;" data-tiles="{top_tiles}"></div>')
             else:
-                unit = metadef_data[k].get('unit', '')
-                for v in d['metadata']['variable']:
-                    kunit = v.get(k, {'unit':None}).get('unit', None)
-                    if kunit:
-                        unit = kunit
-                        break
-
-                meta += f"""
-                    <tr>
-                      <td>{label}</td>
-                      <td>{get_value(metadef_data[k]['name']['ja'])}</td>
-                      <td>{get_value(metadef_data[k]['name']['en'])}</td>
-                      <td>{unit}</td>
-                """
-                for v in d['metadata']['variable']:
-                    meta += f"<td colspan='1' class='break-word white-space-pre-line'>{get_value(v.get(k, {'value':None})['value'])}</td>"
+                top_img = top_img.replace("{{タイル表示}}", "")
 
-                meta += "</tr>"
+            html = base_template.replace("{{データ名}}", dataname)
+            html = html.replace("{{タイル表示スクリプト}}", tile_script if has_tiles else "")
+            html = html.replace("{{TOP画像}}", top_img)
+            html = html.replace("{{カルーセル}}", carousel)
+            html = html.replace("{{Images_Num}}", str(len(get_images(d))))
+            html = html.replace("{{Table_Column_Value}}", column_value)
+            html = html.replace("{{Table_Instrument}}", instrument)
+            html = html.replace("{{Table_Basic}}", basic)
+            html = html.replace("{{Table_Sample}}", sample)
+            html = html.replace("{{Table_Meta}}", meta)
+            html = html.replace("{{グラフ}}", charts)
+            html = html.replace("{{File_Row_Template}}", json.dumps(file_row_template, ensure_ascii=False))
+            html = html.replace("{{File_Eye_Icon}}", json.dumps(file_eye_icon, ensure_ascii=False))
+            html = html.replace("{{File_Page_Size}}", str(FILE_PAGE_SIZE))
+            html = html.replace("{{データID}}", d["id"])
+            html = html.replace("{{All_File_Num}}", str(counter_files))
+            html = html.replace("{{Attachment_Num}}", str(counter_attachments))
 
-        for k in d["invoice"].get("custom", []):
-            if d["invoice"]["custom"][k]:
-                meta += f"""
-                    <tr>
-                      <td>{label}</td>
-                      <td>{invsche_data['properties']['custom']['properties'][k]['label']['ja']}
-                        <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="file earmark text fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-file-earmark-text-fill b-icon bi">
-                          <g>
-                            <path d="M9.293 0H4a2 2 0 0 0-2 2v12a2 2 0 0 0 2 2h8a2 2 0 0 0 2-2V4.707A1 1 0 0 0 13.707 4L10 .293A1 1 0 0 0 9.293 0zM9.5 3.5v-2l3 3h-2a1 1 0 0 1-1-1zM4.5 9a.5.5 0 0 1 0-1h7a.5.5 0 0 1 0 1h-7zM4 10.5a.5.5 0 0 1 .5-.5h7a.5.5 0 0 1 0 1h-7a.5.5 0 0 1-.5-.5zm.5 2.5a.5.5 0 0 1 0-1h4a.5.5 0 0 1 0 1h-4z"></path>
-                          </g>
-                        </svg>
-                      </td>
-                      <td>{invsche_data['properties']['custom']['properties'][k]['label']['en']}</td>
-                      <td>{invsche_data['properties']['custom']['properties'][k].get('options', {}).get('unit', "")}</td>
-                      <td colspan="{metalen}" class="break-word white-space-pre-line">{get_value(d["invoice"]["custom"][k])}</td>
-                    </tr>
-                """
+            html = html.replace("{{Attachments_Src}}", attachments_src)
 
-        for k in d["invoice"].get("sample", {}).get("generalAttributes", []):
-            if k["value"]:
-                meta += f"""
-                    <tr>
-                      <td>{label}</td>
-                      <td>{terms.general_sample_term.get(k['termId'], {}).get('ja', '')}
-                        <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="file earmark text fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-file-earmark-text-fill b-icon bi">
-                          <g>
-                            <path d="M9.293 0H4a2 2 0 0 0-2 2v12a2 2 0 0 0 2 2h8a2 2 0 0 0 2-2V4.707A1 1 0 0 0 13.707 4L10 .293A1 1 0 0 0 9.293 0zM9.5 3.5v-2l3 3h-2a1 1 0 0 1-1-1zM4.5 9a.5.5 0 0 1 0-1h7a.5.5 0 0 1 0 1h-7zM4 10.5a.5.5 0 0 1 .5-.5h7a.5.5 0 0 1 0 1h-7a.5.5 0 0 1-.5-.5zm.5 2.5a.5.5 0 0 1 0-1h4a.5.5 0 0 1 0 1h-4z"></path>
-                          </g>
-                        </svg>
-                      </td>
-                      <td>{terms.general_sample_term.get(k['termId'], {}).get('en', '')}</td>
-                      <td></td>
-                      <td colspan="{metalen}" class="break-word white-space-pre-line">{get_value(k["value"])}</td>
-                    </tr>
-                """
+            # 圧縮する場合
+            if COMPRESS:
+              html = html.replace("\n", "").replace("  ", "")
 
-        for k in d["invoice"].get("sample", {}).get("specificAttributes",[]):
-            if k["value"]:
-                meta += f"""
-                    <tr>
-                      <td>{label}</td>
-                      <td>{terms.sample_class.get(k['classId'], {}).get('ja', k['classId'])} / {terms.specific_sample_term.get(k['termId'], {}).get('ja', k['termId'])}
-                        <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="file earmark text fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-file-earmark-text-fill b-icon bi">
-                          <g>
-                            <path d="M9.293 0H4a2 2 0 0 0-2 2v12a2 2 0 0 0 2 2h8a2 2 0 0 0 2-2V4.707A1 1 0 0 0 13.707 4L10 .293A1 1 0 0 0 9.293 0zM9.5 3.5v-2l3 3h-2a1 1 0 0 1-1-1zM4.5 9a.5.5 0 0 1 0-1h7a.5.5 0 0 1 0 1h-7zM4 10.5a.5.5 0 0 1 .5-.5h7a.5.5 0 0 1 0 1h-7a.5.5 0 0 1-.5-.5zm.5 2.5a.5.5 0 0 1 0-1h4a.5.5 0 0 1 0 1h-4z"></path>
-                          </g>
-                        </svg>
-                      </td>
-                      <td>{terms.sample_class.get(k['classId'], {}).get('en', k['classId'])} / {terms.specific_sample_term.get(k['termId'], {}).get('en', k['termId'])}</td>
-                      <td></td>
-                      <td colspan="{metalen}" class="break-word white-space-pre-line">{get_value(k["value"])}</td>
-                    </tr>
-                """
+            out_sink.write_text(out_html_file, html)
+            out_sink.commit()
+        except Exception:
+            out_sink.discard()
+            add_error(d, "データ詳細ページの作成")
+            create_errorPage(out_sink, d)
 
-        counter_files = 0
-        files = ""
-        for dr in filedirs:
-            if dr in ["main_image", "other_image"]:
-                eye = """
-                    <button type="button" class="btn p-0 btn-link">
-                      <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="eye fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-eye-fill b-icon bi ban">
-                        <g>
-                          <path d="M10.5 8a2.5 2.5 0 1 1-5 0 2.5 2.5 0 0 1 5 0z"></path>
-                          <path d="M0 8s3-5.5 8-5.5S16 8 16 8s-3 5.5-8 5.5S0 8 0 8zm8 3.5a3.5 3.5 0 1 0 0-7 3.5 3.5 0 0 0 0 7z"></path>
-                        </g>
-                      </svg>
-                    </button>
-                """
+    if skipped:
+        write_log(f"[Info] 作成済みのデータ詳細 {skipped} 件をスキップしました。")
+    cache.write_stats("データ詳細")
+    if progress is not None:
+        progress(len(data_info))
+
+def create_viewer(out_sink, base_template, file_row_template, file_eye_icon):
+    """ データ詳細の表示用ページ(viewer.html)の作成 """
+
+    top_image_template = """
+        <div class="border p-2">
+          <div class="d-flex align-items-center justify-content-center main-image-box">
+            <img id="topImg" class="main-image" src="{{画像}}"{{寸法}}>
+            <div id="topTiles" class="main-image tile-viewer" style="display: none;"></div>
+          </div>
+        </div>
+        <div class="text-center main-image-box-width break-word"><span id="topImg_title">{{画像名}}</span></div>
+    """
+
+    carousel_template = """
+        <div class="thumbnail-position px-1 pointer">
+          <div class="text-center d-flex align-items-center justify-content-center image-box" onclick="changeImg('{{画像}}', this.nextElementSibling.innerText, {{タイル}})">
+            <img id="thumbImg" class="image2" src="{{画像}}"{{寸法}} loading="lazy">
+          </div>
+          <div class="text-center image-box-width break-word">{{画像名}}</div>
+        </div>
+    """
+
+    no_top_image = """
+        <div class="border d-flex align-items-center justify-content-center no-image gray" style="width: 500px; height: 350px;">
+          <div class="text-left" style="font-size: 5rem; line-height: 6rem;">
+            <div>No</div>
+            <div>Image</div>
+          </div>
+        </div>
+        <div class="text-center main-image-box-width break-word"><span id="topImg_title"></span></div>
+    """
+
+    no_carousel = """
+        <div class="thumbnail-position px-1">
+          <div class="border d-flex align-items-center justify-content-center no-image gray" style="width: 120px; height: 80px;">
+            <div class="text-left" style="font-size: 1.2rem; line-height: 1.44rem;">
+              <div>No</div>
+              <div>Image</div>
+            </div>
+          </div>
+        </div>
+    """
+
+    row_icon = """
+        <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="file earmark text fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-file-earmark-text-fill b-icon bi">
+          <g>
+            <path d="M9.293 0H4a2 2 0 0 0-2 2v12a2 2 0 0 0 2 2h8a2 2 0 0 0 2-2V4.707A1 1 0 0 0 13.707 4L10 .293A1 1 0 0 0 9.293 0zM9.5 3.5v-2l3 3h-2a1 1 0 0 1-1-1zM4.5 9a.5.5 0 0 1 0-1h7a.5.5 0 0 1 0 1h-7zM4 10.5a.5.5 0 0 1 .5-.5h7a.5.5 0 0 1 0 1h-7a.5.5 0 0 1-.5-.5zm.5 2.5a.5.5 0 0 1 0-1h4a.5.5 0 0 1 0 1h-4z"></path>
+          </g>
+        </svg>
+    """
+
+    # 行は[分類, 日本語名, 英語名, 単位, 値(variableの場合は配列), 表示(1:アイコン付き、2:説明文)]
+    viewer_template = """
+        <script>
+          var ENTRY = null;
+          var TOP_IMAGE_TEMPLATE = {{Top_Image_Template}};
+          var CAROUSEL_TEMPLATE = {{Carousel_Template}};
+          var NO_TOP_IMAGE = {{No_Top_Image}};
+          var NO_CAROUSEL = {{No_Carousel}};
+          var ROW_ICON = {{Row_Icon}};
+
+          function entryImage(template, image) {
+            return template.split('{{画像}}').join(image[0]).split('{{画像名}}').join(image[1]).split('{{寸法}}').join(image[2]).split('{{タイル}}').join(JSON.stringify(image[3]).split('"').join('&quot;'));
+          }
+
+          function entryRow(row, metalen) {
+            var html = '<tr><td>' + row[0] + '</td><td>' + row[1] + (row[5] === 1 ? ROW_ICON : '') + '</td><td>' + row[2] + '</td><td>' + row[3] + '</td>';
+            if (Array.isArray(row[4])) {
+              row[4].forEach(function (value) {
+                html += "<td colspan='1' class='break-word white-space-pre-line'>" + value + '</td>';
+              });
+            } else if (row[5] === 2) {
+              html += '<td colspan="' + metalen + '" class=""><div class="css-reset">' + row[4] + '</div></td>';
+            } else {
+              html += '<td colspan="' + metalen + '" class="break-word white-space-pre-line">' + row[4] + '</td>';
+            }
+            return html + '</tr>';
+          }
+
+          function rdeEntry(entry) {
+            ENTRY = entry;
+            FRAGMENT_SRC.attachments = entry.attachmentsSrc;
+            document.getElementById('entry_name').innerHTML = entry.name;
+            document.getElementById('entry_files_num').innerText = entry.files;
+            document.getElementById('entry_attachments_num').innerText = entry.attachments;
+            document.getElementById('entry_images_num').innerText = entry.images.length;
+            document.getElementById('entry_charts').innerHTML = entry.charts || '';
+            if (entry.images.length === 0) {
+              document.getElementById('entry_top').innerHTML = NO_TOP_IMAGE;
+              document.getElementById('entry_carousel').innerHTML = NO_CAROUSEL;
+            } else {
+              document.getElementById('entry_top').innerHTML = entryImage(TOP_IMAGE_TEMPLATE, entry.images[0]);
+              document.getElementById('entry_carousel').innerHTML = entry.images.map(function (image) { return entryImage(CAROUSEL_TEMPLATE, image); }).join('');
+              showTiles(entry.images[0][3]);
+            }
+            var columns = '';
+            for (var i = 1; i <= entry.metalen; i++) {
+              columns += '<th class="w-200px">値' + i + '</th>';
+            }
+            document.querySelector('#primary-terms-table thead tr').insertAdjacentHTML('beforeend', columns);
+            document.querySelector('#primary-terms-table tbody').innerHTML = entry.rows.map(function (row) { return entryRow(row, entry.metalen); }).join('');
+          }
+
+          function loadEntry() {
+            var id = new URLSearchParams(window.location.search).get('id') || '';
+            var script = document.createElement('script');
+            script.src = './entries/' + encodeURIComponent(id) + '.js';
+            script.onerror = function () { window.location.replace('./' + encodeURIComponent(id) + '.html'); };
+            document.head.appendChild(script);
+          }
+
+          loadEntry();
+        </script>
+    """
+
+    script = viewer_template.replace("{{Top_Image_Template}}", json.dumps(top_image_template, ensure_ascii=False))
+    script = script.replace("{{Carousel_Template}}", json.dumps(carousel_template, ensure_ascii=False))
+    script = script.replace("{{No_Top_Image}}", json.dumps(no_top_image, ensure_ascii=False))
+    script = script.replace("{{No_Carousel}}", json.dumps(no_carousel, ensure_ascii=False))
+    script = script.replace("{{Row_Icon}}", json.dumps(row_icon, ensure_ascii=False))
+
+    # データごとに異なる部分は空の要素にしておき、読み込んだjsで埋める
+    html = base_template.replace("join('{{All_File_Num}}')", "join(String(ENTRY.files))")
+    html = html.replace("'./files/{{データID}}.js'", "'./files/' + ENTRY.id + '.js'")
+    html = html.replace("'./previews/{{データID}}.js'", "'./previews/' + ENTRY.id + '.js'")
+    html = html.replace("'{{Attachments_Src}}'", "''")
+    html = html.replace("{{データ名}}", '<span id="entry_name"></span>')
+    html = html.replace("{{TOP画像}}", '<div id="entry_top"></div>')
+    html = html.replace("{{カルーセル}}", '<div id="entry_carousel" style="display: contents;"></div>')
+    html = html.replace("{{グラフ}}", '<div id="entry_charts"></div>')
+    html = html.replace("{{Images_Num}}", '<span id="entry_images_num"></span>')
+    html = html.replace("{{All_File_Num}}", '<span id="entry_files_num"></span>')
+    html = html.replace("{{Attachment_Num}}", '<span id="entry_attachments_num"></span>')
+    for key in ["{{Table_Column_Value}}", "{{Table_Basic}}", "{{Table_Instrument}}", "{{Table_Sample}}", "{{Table_Meta}}"]:
+        html = html.replace(key, "")
+    html = html.replace("{{File_Row_Template}}", json.dumps(file_row_template, ensure_ascii=False))
+    html = html.replace("{{File_Eye_Icon}}", json.dumps(file_eye_icon, ensure_ascii=False))
+    html = html.replace("{{File_Page_Size}}", str(FILE_PAGE_SIZE))
+    html = html.replace("</body>", script + "</body>")
+
+    # 圧縮する場合
+    if COMPRESS:
+        html = html.replace("\n", "").replace("  ", "")
+
+    out_sink.write_text("viewer.html", html)
+
+def create_entryData(out_sink, d, metadef_data, invsche_data, terms, metakeys, metalen, counter_files, counter_attachments, attachments_src, charts=""):
+    """ データ詳細の表示用データ(entries/{id}.js)の作成 """
+
+    basic = d["invoice"]["basic"]
+    rows = [["基本情報", "記入年月日", "Date of Data Entry", "", f"{basic['dateSubmitted']} JST"],
+            ["", "データ所有者(所属)", "Data Owner (Affiliation)", "", "プレビューユーザ"],
+            ["", "データ名", "Data Name", "", get_dataname(d)],
+            ["", "実験ID", "Experiment ID", "", f"{get_value(basic['experimentId'])}"],
+            ["", "説明", "Description", "", f"{get_value(basic['description'])}"],
+            ["装置情報", "登録名", "Registration Name", "", "**プレビューでは非表示**"],
+            ["", "機関", "Organization", "", "**プレビューでは非表示**"],
+            ["", "説明", "Description", "", "**プレビューでは非表示**"],
+            ["試料情報", "試料名(ローカルID)", "Sample Name (Local ID)", "", f"{get_sample_id(d)}"],
+            ["", "化学式・組成式・分子式など", "Chemical Formula etc.", "", f"{get_value(d['invoice']['sample']['composition'])}"],
+            ["", "試料の説明", "Description", "", f"{get_value(d['invoice']['sample']['description'])}", 2]]
+
+    # 固有情報の行の選び方はhtmlで出力する場合と同じ
+    label = OneTimeUse("固有情報")
+    for k in metakeys:
+        name = [f"{get_value(metadef_data[k]['name']['ja'])}", f"{get_value(metadef_data[k]['name']['en'])}"]
+        if metadef_data[k].get("variable", 2) == 2:
+            if d['metadata']['constant'].get(k, False):
+                unit = get_value(d['metadata']['constant'][k].get('unit'), metadef_data[k].get('unit', ''))
+                rows.append([str(label)] + name + [f"{unit}", f"{get_value(d['metadata']['constant'][k]['value'])}"])
+        else:
+            unit = metadef_data[k].get('unit', '')
+            for v in d['metadata']['variable']:
+                kunit = v.get(k, {'unit':None}).get('unit', None)
+                if kunit:
+                    unit = kunit
+                    break
+            if len(d['metadata']['variable']) > VARIABLE_COLUMNS_MAX:
+                rows.append([str(label)] + name + [f"{unit}", [get_variable_cell(d, k)]])
             else:
-                eye = ""
-            for f in d["files"].get(dr, []):
-                counter_files += 1
-                files += f"""
-                    <tr>
-                      <td><div class="word-break m-0">{counter_files}</div></td>
-                      <td><div class="word-break m-0">{filedirs[dr]}</div></td>
-                      <td>
-                        <div>
-                          <div class="d-flex">
-                            <div class="break-word">{f['name']}</div>
-                            <div class="text-right ml-auto"></div>
-                            {eye}
-                            <div class="ml-2 mt-1">
-                              <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="download" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-download p-0 pointer b-icon bi ban">
-                                <g>
-                                  <path d="M.5 9.9a.5.5 0 0 1 .5.5v2.5a1 1 0 0 0 1 1h12a1 1 0 0 0 1-1v-2.5a.5.5 0 0 1 1 0v2.5a2 2 0 0 1-2 2H2a2 2 0 0 1-2-2v-2.5a.5.5 0 0 1 .5-.5z"></path>
-                                  <path d="M7.646 11.854a.5.5 0 0 0 .708 0l3-3a.5.5 0 0 0-.708-.708L8.5 10.293V1.5a.5.5 0 0 0-1 0v8.793L5.354 8.146a.5.5 0 1 0-.708.708l3 3z"></path>
-                                </g>
-                              </svg>
-                              <a target="_blank" style="display: none;"></a>
-                            </div>
-                          </div>
-                        </div>
-                      </td>
-                      <td class=""><div class="word-break m-0">{d['invoice']['basic']['dateSubmitted']}</div></td>
-                      <td class=""><div class="word-break m-0">{f['size']}</div></td>
-                    </tr>
-                """
+                rows.append([str(label)] + name + [f"{unit}", [f"{get_value(v.get(k, {'value':None})['value'])}" for v in d['metadata']['variable']]])
 
-        counter_attachments = 0
-        attachments = ""
-        for f in d["files"].get("attachment", []):
-            counter_attachments += 1
-            attachments += f"""
-              <tr>
-                <td><div class="word-break m-0">{counter_attachments}</div></td>
-                <td>
-                  <div>
-                    <div class="d-flex">
-                      <div class="break-word">{f['name']}</div>
-                      <div class="text-right ml-auto"></div>
-                      <div class="ml-2 mt-1">
-                        <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="download" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-download p-0 pointer b-icon bi ban">
-                          <g>
-                            <path d="M.5 9.9a.5.5 0 0 1 .5.5v2.5a1 1 0 0 0 1 1h12a1 1 0 0 0 1-1v-2.5a.5.5 0 0 1 1 0v2.5a2 2 0 0 1-2 2H2a2 2 0 0 1-2-2v-2.5a.5.5 0 0 1 .5-.5z"></path><path d="M7.646 11.854a.5.5 0 0 0 .708 0l3-3a.5.5 0 0 0-.708-.708L8.5 10.293V1.5a.5.5 0 0 0-1 0v8.793L5.354 8.146a.5.5 0 1 0-.708.708l3 3z"></path>
-                          </g>
-                        </svg>
-                      </div>
-                    </div>
-                  </div>
-                </td>
-                <td><div class="word-break m-0">{d['invoice']['basic']['dateSubmitted']}</div></td>
-                <td><div class="word-break m-0">{f['size']}</div></td>
-                <td><div class="word-break m-0"></div></td>
-                <td class="text-center">
-                  <svg viewBox="0 0 16 16" width="1em" height="1em" focusable="false" role="img" aria-label="trash fill" xmlns="http://www.w3.org/2000/svg" fill="currentColor" class="bi-trash-fill pointer b-icon bi ban" style="font-size: 150%;">
-                    <g>
-                      <path d="M2.5 1a1 1 0 0 0-1 1v1a1 1 0 0 0 1 1H3v9a2 2 0 0 0 2 2h6a2 2 0 0 0 2-2V4h.5a1 1 0 0 0 1-1V2a1 1 0 0 0-1-1H10a1 1 0 0 0-1-1H7a1 1 0 0 0-1 1H2.5zm3 4a.5.5 0 0 1 .5.5v7a.5.5 0 0 1-1 0v-7a.5.5 0 0 1 .5-.5zM8 5a.5.5 0 0 1 .5.5v7a.5.5 0 0 1-1 0v-7A.5.5 0 0 1 8 5zm3 .5v7a.5.5 0 0 1-1 0v-7a.5.5 0 0 1 1 0z"></path>
-                    </g>
-                  </svg>
-                </td>
-              </tr>
-              """
+    for k in d["invoice"].get("custom", []):
+        if d["invoice"]["custom"][k]:
+            prop = invsche_data['properties']['custom']['properties'][k]
+            rows.append([str(label), f"{prop['label']['ja']}", f"{prop['label']['en']}", f"{prop.get('options', {}).get('unit', '')}", f"{get_value(d['invoice']['custom'][k])}", 1])
+
+    for k in d["invoice"].get("sample", {}).get("generalAttributes", []):
+        if k["value"]:
+            rows.append([str(label), terms.general_sample_term.get(k['termId'], {}).get('ja', ''), terms.general_sample_term.get(k['termId'], {}).get('en', ''), "", f"{get_value(k['value'])}", 1])
 
-        if counter_attachments == 0:
-            attachments_display = 'style="display: none;"'
+    for k in d["invoice"].get("sample", {}).get("specificAttributes", []):
+        if k["value"]:
+            rows.append([str(label),
+                         f"{terms.sample_class.get(k['classId'], {}).get('ja', k['classId'])} / {terms.specific_sample_term.get(k['termId'], {}).get('ja', k['termId'])}",
+                         f"{terms.sample_class.get(k['classId'], {}).get('en', k['classId'])} / {terms.specific_sample_term.get(k['termId'], {}).get('en', k['termId'])}",
+                         "", f"{get_value(k['value'])}", 1])
+
+    images = [[get_tile_preview(img) or get_image_path(d, m, img), img["name"], get_image_attrs(img), img.get("tiles")] for m, img in get_images(d)]
+    entry = {"id":d["id"], "name":get_dataname(d), "metalen":metalen, "images":images, "rows":rows,
+             "files":counter_files, "attachments":counter_attachments, "attachmentsSrc":attachments_src, "charts":charts}
+
+    # file://でも読み込めるようにjsonではなくscriptとして出力する
+    out_sink.write_text(f"entries/{d['id']}.js", f"rdeEntry({json.dumps(entry, ensure_ascii=False, separators=(',', ':'))});\n")
+
+def write_fragment(out_sink, name, html):
+    """ タブの遅延読み込み用ファイルの作成 """
+
+    # 圧縮する場合
+    if COMPRESS:
+        html = html.replace("\n", "").replace("  ", "")
+
+    # サーバー経由で開いた場合はhtmlを、file://で開いた場合はscriptを読み込む
+    out_sink.write_text(f"fragments/{name}.html", html)
+    out_sink.write_text(f"fragments/{name}.js", f"rdeFragment({json.dumps(name.split('.')[-1])}, {json.dumps(html, ensure_ascii=False)});\n")
+
+def create_file_list(out_sink, data, filedirs):
+    """ ファイル一覧のjsonの作成 """
+
+    # 行は[種別番号, ファイル名, 表示サイズ, バイト数, ファイル名の順位, 行数(プレビューがある場合)]
+    # ソートはブラウザ側で数値比較だけで済むように順位を出力時に求めておく
+    rows = []
+    previews = {}
+    for kind, dr in enumerate(filedirs):
+        for f in data["files"].get(dr, []):
+            preview = None
+            if dr == "structured" and f["name"].lower().endswith(TEXT_PREVIEW_SUFFIXES):
+                # プレビューを作成できないファイルがあっても一覧は表示する
+                try:
+                    preview = get_text_preview(data["dir"].joinpath(dr, f["name"]))
+                    previews[len(rows)] = preview
+                except Exception:
+                    write_log(f"[Error] ファイル {f['name']} のプレビューの作成に失敗しました。処理を続行します。\n{traceback.format_exc()}")
+            rows.append([kind, f["name"], f["size"], f["bytes"], 0, None if preview is None else preview["lines"]])
+    for rank, i in enumerate(sorted(range(len(rows)), key=lambda i: (rows[i][1].lower(), rows[i][1]))):
+        rows[i][4] = rank
+
+    file_list = {"kinds":list(filedirs.values()),
+                 "eye":[dr in ["main_image", "other_image"] for dr in filedirs],
+                 "date":data["invoice"]["basic"]["dateSubmitted"],
+                 "rows":rows}
+
+    # file://でも読み込めるようにjsonではなくscriptとして出力する
+    out_sink.write_text(f"files/{data['id']}.js", f"rdeFiles({json.dumps(file_list, ensure_ascii=False, separators=(',', ':'))});\n")
+
+    # プレビューは開いたときに読み込む
+    if previews:
+        out_sink.write_text(f"previews/{data['id']}.js", f"rdePreviews({json.dumps(previews, ensure_ascii=False, separators=(',', ':'))});\n")
+
+    return len(rows)
+
+def get_text_preview(ifile):
+    """ テキストファイルの行数と先頭の行の取得(全体はデコードせず、メモリマップしたまま改行の数だけを数える) """
+
+    chunk_size = 16 * 1024 * 1024
+    with ifile.open("rb") as f:
+        if isinstance(ifile, ArchivePath):
+            # アーカイブ内のファイルはメモリマップできないため、順に読み込んで数える
+            head = f.read(TEXT_PREVIEW_BYTES)
+            complete = len(head) < TEXT_PREVIEW_BYTES
+            lines = head.count(b"\n")
+            last = head[-1:]
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
         else:
-            attachments_display = ""
-
-        html = base_template.replace("{{データ名}}", dataname)
-        html = html.replace("{{TOP画像}}", top_img)
-        html = html.replace("{{カルーセル}}", carousel)
-        html = html.replace("{{Images_Num}}", str(get_file_len(d, ["main_image","other_image"])))
-        html = html.replace("{{Table_Column_Value}}", column_value)
-        html = html.replace("{{Table_Instrument}}", instrument)
-        html = html.replace("{{Table_Basic}}", basic)
-        html = html.replace("{{Table_Sample}}", sample)
-        html = html.replace("{{Table_Meta}}", meta)
-        html = html.replace("{{Table_Files}}", files)
-        html = html.replace("{{All_File_Num}}", str(counter_files))
-        html = html.replace("{{Attachment_Num}}", str(counter_attachments))
-        html = html.replace("{{Table_Attachments_Display}}", attachments_display)
-        html = html.replace("{{Table_Attachments}}", attachments)
-
-        # 圧縮する場合
-        if COMPRESS:
-          html = html.replace("\n", "").replace("  ", "")
+            size = os.fstat(f.fileno()).st_size
+            complete = size <= TEXT_PREVIEW_BYTES
+            if complete:
+                head = f.read()
+                lines = head.count(b"\n")
+                last = head[-1:]
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    head = mm[:TEXT_PREVIEW_BYTES]
+                    lines = sum(mm[pos:pos+chunk_size].count(b"\n") for pos in range(0, size, chunk_size))
+                    last = mm[-1:]
 
-        with open(out_html_file, "w", encoding="utf_8") as f:
-            f.write(html)
+    # 最後の行に改行がない場合も1行と数える
+    if last not in (b"", b"\n"):
+        lines += 1
 
-def create_dataList(input_dir, out_root_dir, data_info):
+    # 途中で切れた最後の行は除く(1行目が上限を超える場合はそのまま表示する)
+    parts = head.split(b"\n")
+    if not complete and len(parts) > 1:
+        parts = parts[:-1]
+    text = decode_text(b"\n".join(parts[:TEXT_PREVIEW_ROWS]))
+    head_lines = text.splitlines()
+    if ifile.name.lower().endswith(".csv"):
+        rows = list(csv.reader(head_lines))
+    elif ifile.name.lower().endswith(".tsv"):
+        rows = list(csv.reader(head_lines, delimiter="\t"))
+    else:
+        rows = [[line] for line in head_lines]
+    return {"lines":lines, "rows":rows}
+
+def create_charts(d):
+    """ 構造化ファイルのうち2列の数値のcsvのグラフの作成 """
+
+    if not CHART_STRUCTURED:
+        return ""
+
+    charts = []
+    for f in d["files"].get("structured", []):
+        if len(charts) >= CHART_MAX_FILES:
+            break
+        if not f["name"].lower().endswith(".csv"):
+            continue
+        # グラフを作成できないファイルがあってもページは表示する
+        try:
+            result = get_chart_points(d["dir"].joinpath("structured", f["name"]))
+        except Exception:
+            write_log(f"[Error] ファイル {f['name']} のグラフの作成に失敗しました。処理を続行します。\n{traceback.format_exc()}")
+            continue
+        if result is not None:
+            charts.append(create_chart(f["name"], *result))
+
+    if not charts:
+        return ""
+    return f"""
+        <div class="card mt-3">
+          <div class="card-body px-4">
+            <h5 class="card-title">構造化ファイルのグラフ</h5>
+            {"".join(charts)}
+          </div>
+        </div>
+    """
+
+def get_chart_points(ifile):
+    """ 2列の数値のcsvの読み込み(2列の数値でない場合はNone) """
+
+    # 1行ずつ読み込み、size行ごとの区間の最初・最後・最小・最大の点だけを残す
+    # 区間の数が上限に達したら隣り合う2区間をまとめてsizeを2倍にするため、行数によらずメモリの使用量は一定になる
+    labels = None
+    buckets = []
+    size = 1
+    total = 0
+    with ifile.open("rb") as f:
+        for line in f:
+            fields = line.split(b",")
+            if len(fields) != 2:
+                if line.strip() == b"" or line.startswith(b"#"):
+                    continue
+                return None
+            try:
+                x = float(fields[0])
+                y = float(fields[1])
+            except ValueError:
+                # データの前の1行だけを見出しとみなす
+                if total == 0 and labels is None:
+                    labels = [v.strip() for v in decode_text(line).split(",")]
+                    continue
+                return None
+            if not (math.isfinite(x) and math.isfinite(y)):
+                continue
+
+            point = (total, x, y)
+            if total // size < len(buckets):
+                bucket = buckets[-1]
+                bucket[1] = point
+                if y < bucket[2][2]:
+                    bucket[2] = point
+                elif y > bucket[3][2]:
+                    bucket[3] = point
+            else:
+                if len(buckets) == CHART_POINTS * 2:
+                    buckets = [merge_chart_buckets(buckets[i], buckets[i+1]) for i in range(0, len(buckets), 2)]
+                    size *= 2
+                buckets.append([point, point, point, point])
+            total += 1
+
+    if total < 2:
+        return None
+
+    # 区間ごとの点を元の順に並べてから、形を保つように間引く
+    points = []
+    for bucket in buckets:
+        for i, x, y in sorted(set(bucket)):
+            points.append((x, y))
+    return labels or ["x", "y"], lttb(points, CHART_POINTS), total
+
+def merge_chart_buckets(a, b):
+    """ 隣り合う2区間の最初・最後・最小・最大の点をまとめる """
+
+    return [a[0], b[1], min(a[2], b[2], key=lambda p: p[2]), max(a[3], b[3], key=lambda p: p[2])]
+
+def lttb(points, threshold):
+    """ Largest-Triangle-Three-Bucketsによる間引き(各区間で前後の点と作る三角形が最大の点を残す) """
+
+    if len(points) <= threshold or threshold < 3:
+        return points
+
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # 次の区間の平均
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, len(points))
+        avg_x = sum(p[0] for p in points[start:end]) / (end - start)
+        avg_y = sum(p[1] for p in points[start:end]) / (end - start)
+
+        # この区間で三角形の面積が最大の点
+        ax, ay = points[a]
+        max_area = -1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                a_next = j
+        sampled.append(points[a_next])
+        a = a_next
+    sampled.append(points[-1])
+    return sampled
+
+def create_chart(name, labels, points, total):
+    """ グラフ(svg)の作成 """
+
+    width, height = 720, 260
+    left, right, top, bottom = 70, 15, 10, 40
+    plot_width = width - left - right
+    plot_height = height - top - bottom
+
+    x_min, x_max = min(p[0] for p in points), max(p[0] for p in points)
+    y_min, y_max = min(p[1] for p in points), max(p[1] for p in points)
+    if x_min == x_max:
+        x_min, x_max = x_min - 0.5, x_max + 0.5
+    if y_min == y_max:
+        y_min, y_max = y_min - 0.5, y_max + 0.5
+
+    coords = " ".join(f"{left + (x - x_min) / (x_max - x_min) * plot_width:.1f},{top + (y_max - y) / (y_max - y_min) * plot_height:.1f}" for x, y in points)
+    note = f"、{len(points):,} 点に間引いて表示" if len(points) < total else ""
+    return f"""
+        <div class="mt-3">
+          <div class="small">{html_escape(name)}(全 {total:,} 点{note})</div>
+          <svg viewBox="0 0 {width} {height}" width="{width}" height="{height}" role="img" aria-label="{html_escape(name)}">
+            <rect x="{left}" y="{top}" width="{plot_width}" height="{plot_height}" fill="none" stroke="#ced4da"></rect>
+            <polyline points="{coords}" fill="none" stroke="#007bff" stroke-width="1"></polyline>
+            <text x="{left}" y="{top + plot_height + 16}" font-size="11" text-anchor="start">{x_min:.4g}</text>
+            <text x="{left + plot_width}" y="{top + plot_height + 16}" font-size="11" text-anchor="end">{x_max:.4g}</text>
+            <text x="{left - 4}" y="{top + plot_height}" font-size="11" text-anchor="end">{y_min:.4g}</text>
+            <text x="{left - 4}" y="{top + 10}" font-size="11" text-anchor="end">{y_max:.4g}</text>
+            <text x="{left + plot_width / 2}" y="{height - 6}" font-size="12" text-anchor="middle">{html_escape(labels[0])}</text>
+            <text transform="translate(14 {top + plot_height / 2}) rotate(-90)" font-size="12" text-anchor="middle">{html_escape(labels[-1])}</text>
+          </svg>
+        </div>
+    """
+
+def get_variable_cell(d, k):
+    """ ステップ数の多いvariableメタの値の欄の作成(数値の項目はグラフ、それ以外は値の種類) """
+
+    values = [v.get(k, {'value':None})['value'] for v in d['metadata']['variable']]
+    points = []
+    for step, value in enumerate(values, 1):
+        if value is None or value == "":
+            continue
+        try:
+            y = float(value)
+        except (TypeError, ValueError):
+            points = None
+            break
+        if isinstance(value, bool) or not math.isfinite(y):
+            points = None
+            break
+        points.append((step, y))
+
+    if not points:
+        # 数値でない場合は出現順に値の種類を並べる
+        kinds = list(dict.fromkeys(f"{get_value(value)}" for value in values))
+        note = f" ほか {len(kinds) - 10:,} 種" if len(kinds) > 10 else ""
+        return " / ".join(kinds[:10]) + note + f"(全 {len(values):,} ステップ)"
+
+    width, height = 240, 36
+    sampled = lttb(points, VARIABLE_CHART_POINTS)
+    y_min, y_max = min(p[1] for p in points), max(p[1] for p in points)
+    span = (y_max - y_min) or 1
+    coords = " ".join(f"{(x - 1) / max(len(values) - 1, 1) * width:.1f},{2 + (y_max - y) / span * (height - 4):.1f}" for x, y in sampled)
+    note = f"、{len(sampled):,} 点に間引いて表示" if len(sampled) < len(points) else ""
+    return (f'<svg viewBox="0 0 {width} {height}" width="{width}" height="{height}" role="img" aria-label="{html_escape(k)}" class="align-middle">'
+            f'<polyline points="{coords}" fill="none" stroke="#007bff" stroke-width="1"></polyline></svg>'
+            f'<span class="small ml-2">{y_min:.6g} ～ {y_max:.6g}(全 {len(values):,} ステップ{note})</span>')
+
+def decode_text(data):
+    """ テキストのデコード(UTF-8でなければShift_JISとみなす) """
+
+    for encoding in ["utf_8_sig", "cp932"]:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return data.decode("utf_8", errors="replace")
+
+def create_dataList(input_dir, out_sink, data_info, partial="", progress=False):
     """ index.htmlの作成 """
 
-    out_html_file = out_root_dir.joinpath("index.html")
+    out_html_file = "index.html"
 
     base_template = """
         <!DOCTYPE html>
@@ -1083,15 +2864,132 @@ def create_dataList(input_dir, out_root_dir, data_info):
           <meta data-hid="description" name="description" content="">
           <meta name="format-detection" content="telephone=no">
           <meta name="viewport" content="width=device-width, initial-scale=1">
-          <link rel="stylesheet" href="style.css">
+          <link rel="stylesheet" href="{{スタイルシート}}">
+          <script src="search_index.js" defer></script>
+          <script defer>
+            var SEARCH_PATTERN = new RegExp('{{検索パターン}}', 'g');
+            var DETAIL_URL = {{詳細URL}};
+            var searchCache = {lists: {}, tokens: {}};
+
+            function searchTokens(text) {
+              var tokens = [];
+              (String(text).toLowerCase().match(SEARCH_PATTERN) || []).forEach(function (t) {
+                if (/^[\\x00-\\x7f]*$/.test(t)) {
+                  tokens.push(t);
+                } else {
+                  for (var i = 0; i < t.length; i++) {
+                    tokens.push(t.slice(i));
+                  }
+                }
+              });
+              return tokens;
+            }
+
+            function searchList(index, key) {
+              if (!(key in searchCache.lists)) {
+                var list = [];
+                var value = 0;
+                (index.prefix[key] || []).forEach(function (delta) {
+                  value += delta;
+                  list.push(value);
+                });
+                searchCache.lists[key] = list;
+              }
+              return searchCache.lists[key];
+            }
+
+            function searchMatch(index, i, tokens) {
+              if (!(i in searchCache.tokens)) {
+                searchCache.tokens[i] = searchTokens(index.entries[i].slice(1).join(' '));
+              }
+              var entryTokens = searchCache.tokens[i];
+              return tokens.every(function (t) {
+                return entryTokens.some(function (e) { return e.indexOf(t) === 0; });
+              });
+            }
+
+            function searchData(query) {
+              var index = window.RDE_SEARCH_INDEX;
+              if (!index) {
+                return;
+              }
+              var tokens = String(query).toLowerCase().match(SEARCH_PATTERN) || [];
+              var hits = null;
+              tokens.forEach(function (t) {
+                var list = searchList(index, t.slice(0, index.n));
+                if (hits === null) {
+                  hits = list;
+                } else {
+                  var keep = {};
+                  list.forEach(function (i) { keep[i] = true; });
+                  hits = hits.filter(function (i) { return keep[i]; });
+                }
+              });
+              if (hits !== null) {
+                hits = hits.filter(function (i) { return searchMatch(index, i, tokens); });
+              }
+              showSearchResults(index, hits);
+            }
+
+            function showSearchResults(index, hits) {
+              var results = document.getElementById('search_results');
+              var count = document.getElementById('search_count');
+              results.innerHTML = '';
+              if (hits === null) {
+                count.innerText = '';
+                filterCards(null);
+                return;
+              }
+              count.innerText = hits.length + ' 件';
+              hits.slice(0, 50).forEach(function (i) {
+                var entry = index.entries[i];
+                var li = document.createElement('li');
+                var a = document.createElement('a');
+                a.href = DETAIL_URL.split('{id}').join(entry[0]);
+                a.innerText = entry[1];
+                a.onclick = function () { return jumpToCard(i); };
+                var small = document.createElement('small');
+                small.className = 'text-muted ml-2';
+                small.innerText = entry[2] + ' ' + entry[4];
+                li.appendChild(a);
+                li.appendChild(small);
+                results.appendChild(li);
+              });
+              filterCards(hits);
+            }
+
+            function filterCards(hits) {
+              var keep = null;
+              if (hits !== null) {
+                keep = {};
+                hits.forEach(function (i) { keep[window.RDE_SEARCH_INDEX.entries[i][0]] = true; });
+              }
+              document.querySelectorAll('[id^="card-"]').forEach(function (card) {
+                var show = keep === null || keep[card.id.slice(5)];
+                card.style.display = show ? '' : 'none';
+              });
+            }
+
+            function jumpToCard(i) {
+              var card = document.getElementById('card-' + window.RDE_SEARCH_INDEX.entries[i][0]);
+              if (!card || card.style.display === 'none') {
+                return true;
+              }
+              document.querySelectorAll('.search-hit').forEach(function (e) { e.classList.remove('search-hit'); });
+              card.classList.add('search-hit');
+              card.scrollIntoView({block: 'center'});
+              return false;
+            }
+          </script>
+          {{一覧スクリプト}}
         </head>
         <body>
           <div>
             <div>
               <header class="header container px-0">
-                <h1 class="logo"><img src="https://rde.nims.go.jp/images/logo/RDE_logo.png"></h1>
+                <h1 class="logo"><img src="assets/RDE_logo.svg" alt="RDE"></h1>
                 <div class="menu">
-                  <a class="dicehome"><img src="https://rde.nims.go.jp/external/dice.png"></a>
+                  <a class="dicehome"><img src="assets/dice.svg" alt="DICE"></a>
                   <a class="register ban">ログアウト</a>
                 </div>
               </header>
@@ -1114,11 +3012,14 @@ def create_dataList(input_dir, out_root_dir, data_info):
                     <span class="badge badge-pill badge-success white-space-pre-line break-word text-left"></span>
                   </h2>
                   <div class="form-buttons mt-3 d-flex justify-content-end">
+                    <a href="./matrix.html"><button type="button" class="btn btn-144px btn-primary ml-2">メタデータ一覧</button></a>
                     <button type="button" class="btn btn-144px btn-primary ml-2 ban" disabled>データセット詳細</button>
                     <button type="button" class="btn btn-144px btn-secondary ml-2 ban" disabled>データセット一覧へ戻る</button>
                   </div>
                   <div>
                     <div class="alert text-danger py-0 mb-3" style="display: none;"></div>
+                    {{部分プレビュー}}
+                    {{作成状況}}
                   </div>
                   <div class="card mt-3">
                     <div class="card-body">
@@ -1132,6 +3033,17 @@ def create_dataList(input_dir, out_root_dir, data_info):
                       <a class="nav-link active">ギャラリー表示</a>
                     </li>
                   </ul>
+                  <div class="row form-group mt-3">
+                    <div class="col-4">
+                      <input id="search_box" type="text" class="form-control" placeholder="データ名・試料名・説明・登録日で検索" oninput="searchData(this.value)">
+                    </div>
+                    <div class="col-8 d-flex align-items-center">
+                      <span id="search_count"></span>
+                    </div>
+                    <div class="col-12">
+                      <ul id="search_results" class="search-results"></ul>
+                    </div>
+                  </div>
                   <div>
                     <div class="row form-group">
                       {{カード}}
@@ -1157,8 +3069,8 @@ def create_dataList(input_dir, out_root_dir, data_info):
                       </div>
                     </div>
                     <div class="row">
-                      <a><img src="https://rde.nims.go.jp/sample_files/dice399-46.png" alt="国立研究開発法人物質・材料研究機構"></a>
-                      <a><img src="https://rde.nims.go.jp/sample_files/rde2_logo_arim.png" alt="マテリアル先端リサーチインフラ事業"></a>
+                      <a><img src="assets/dice_nims.svg" alt="国立研究開発法人物質・材料研究機構"></a>
+                      <a><img src="assets/arim.svg" alt="マテリアル先端リサーチインフラ事業"></a>
                     </div>
                   </div>
                 </div>
@@ -1187,7 +3099,7 @@ def create_dataList(input_dir, out_root_dir, data_info):
     """
 
     card_template = """
-        <div class="col-4 mt-3">
+        <div id="card-{{データID}}" class="col-4 mt-3">
           <div class="card h-100">
             <div class="card-header bg-transparent">
               <a href="{{HTMLファイル}}">{{データ名}}</a>
@@ -1208,64 +3120,675 @@ def create_dataList(input_dir, out_root_dir, data_info):
                 <div class="col-12">説明</div>
                 <div class="col-12 white-space-pre-line">{{データ説明}}</div>
               </div>
-              <div class="row form-group">
-                <div class="col-12">タクソノミー</div>
+              <div class="row form-group">
+                <div class="col-12">タクソノミー</div>
+              </div>
+            </div>
+            <div class="card-footer bg-transparent">
+              <p class="card-text text-right mb-2"><small class="text-muted">登録日時 {{登録日時}}</small></p>
+              <p class="card-text text-right"><small class="text-muted">データID N/A</small></p>
+            </div>
+          </div>
+        </div>
+    """
+
+    virtual_template = """
+        <script defer>
+          var CARD_FIELDS = {{Card_Fields}};
+          var CARD_TEMPLATE = {{Card_Template}};
+          var THUMBNAIL_TEMPLATE = {{Thumbnail_Template}};
+          var NO_THUMBNAIL_TEMPLATE = {{No_Thumbnail_Template}};
+          var SPRITE_TEMPLATE = {{Sprite_Template}};
+          var virtualGrid = {total: {{Data_Num}}, chunkSize: {{Chunk_Size}}, rowHeight: {{Row_Height}}, columns: 3,
+                             chunks: {}, loading: {}, order: null, range: '', hit: null, pending: false};
+
+          function rdeCardChunk(n, cards) {
+            virtualGrid.chunks[n] = cards;
+            delete virtualGrid.loading[n];
+            renderGrid(true);
+          }
+
+          function loadChunk(n) {
+            if (n in virtualGrid.chunks || n in virtualGrid.loading) {
+              return;
+            }
+            virtualGrid.loading[n] = true;
+            var script = document.createElement('script');
+            script.src = './cards/cards_' + ('0000' + n).slice(-5) + '.js';
+            document.head.appendChild(script);
+          }
+
+          function cardHtml(values) {
+            var card = CARD_TEMPLATE;
+            CARD_FIELDS.forEach(function (field, k) {
+              card = card.split('{{' + field + '}}').join(values[k]);
+            });
+            var thumb = values[CARD_FIELDS.indexOf('サムネイル')];
+            var sprite = values[CARD_FIELDS.indexOf('サムネイルスプライト')];
+            if (thumb === '') {
+              thumb = NO_THUMBNAIL_TEMPLATE;
+            } else if (sprite !== '') {
+              thumb = SPRITE_TEMPLATE.split('{{サムネイルスプライト}}').join(sprite);
+            } else {
+              thumb = THUMBNAIL_TEMPLATE.split('{{サムネイル}}').join(thumb).split('{{サムネイル寸法}}').join(values[CARD_FIELDS.indexOf('サムネイル寸法')]).replace('<img ', '<img loading="lazy" ');
+            }
+            return card.split('{{サムネイル画像}}').join(thumb);
+          }
+
+          function renderGrid(force) {
+            var grid = document.getElementById('card_grid');
+            var count = virtualGrid.order === null ? virtualGrid.total : virtualGrid.order.length;
+            var rows = Math.ceil(count / virtualGrid.columns);
+            var top = -grid.getBoundingClientRect().top;
+            var first = Math.max(0, Math.floor(top / virtualGrid.rowHeight) - 1);
+            var last = Math.min(rows, Math.ceil((top + window.innerHeight) / virtualGrid.rowHeight) + 1);
+            var range = first + '-' + last + '-' + count;
+            grid.style.height = (rows * virtualGrid.rowHeight) + 'px';
+            if (!force && range === virtualGrid.range) {
+              return;
+            }
+            virtualGrid.range = range;
+            var html = '';
+            for (var r = first; r < last; r++) {
+              html += '<div class="row virtual-row" style="top: ' + (r * virtualGrid.rowHeight) + 'px; height: ' + virtualGrid.rowHeight + 'px;">';
+              for (var c = 0; c < virtualGrid.columns; c++) {
+                var pos = r * virtualGrid.columns + c;
+                if (pos >= count) {
+                  break;
+                }
+                var i = virtualGrid.order === null ? pos : virtualGrid.order[pos];
+                var chunk = virtualGrid.chunks[Math.floor(i / virtualGrid.chunkSize)];
+                if (chunk) {
+                  html += cardHtml(chunk[i % virtualGrid.chunkSize]);
+                } else {
+                  loadChunk(Math.floor(i / virtualGrid.chunkSize));
+                  html += '<div class="col-4 mt-3"><div class="card h-100"></div></div>';
+                }
+              }
+              html += '</div>';
+            }
+            grid.innerHTML = html;
+            if (virtualGrid.hit !== null) {
+              var card = document.getElementById('card-' + virtualGrid.hit);
+              if (card) {
+                card.classList.add('search-hit');
+              }
+            }
+          }
+
+          function scheduleGrid() {
+            if (virtualGrid.pending) {
+              return;
+            }
+            virtualGrid.pending = true;
+            window.requestAnimationFrame(function () {
+              virtualGrid.pending = false;
+              renderGrid(false);
+            });
+          }
+
+          function filterCards(hits) {
+            virtualGrid.order = hits;
+            virtualGrid.hit = null;
+            renderGrid(true);
+          }
+
+          function jumpToCard(i) {
+            var pos = virtualGrid.order === null ? i : virtualGrid.order.indexOf(i);
+            if (pos < 0) {
+              return true;
+            }
+            var grid = document.getElementById('card_grid');
+            var row = Math.floor(pos / virtualGrid.columns);
+            virtualGrid.hit = window.RDE_SEARCH_INDEX.entries[i][0];
+            window.scrollTo(0, window.pageYOffset + grid.getBoundingClientRect().top + row * virtualGrid.rowHeight);
+            renderGrid(true);
+            return false;
+          }
+
+          window.addEventListener('scroll', scheduleGrid);
+          window.addEventListener('resize', scheduleGrid);
+          document.addEventListener('DOMContentLoaded', function () { renderGrid(true); });
+        </script>
+    """
+
+    no_thumbnail_template = """
+        <div class="border d-flex align-items-center justify-content-center no-image white" style="width: 250px; height: 250px;">
+          <div class="text-left" style="font-size: 2.5rem; line-height: 3rem;">
+            <div>No</div>
+            <div>Image</div>
+          </div>
+        </div>
+    """
+
+    thumbnail_template = """
+        <span>
+          <img id="thumbnailImg" class="image" src="{{サムネイル}}"{{サムネイル寸法}}>
+        </span>
+    """
+
+    sprite_template = """
+        <span>
+          <span id="thumbnailImg" class="image sprite" role="img" style="{{サムネイルスプライト}}"></span>
+        </span>
+    """
+
+    progress_template = """
+        <div id="build_progress" class="alert alert-warning py-1 mb-3">
+          残りのデータ詳細を作成しています。(<span id="build_progress_count">0 / {{Data_Num}}</span>)作成前のデータ詳細は開けません。
+        </div>
+        <script>
+          function rdeProgress(done, total) {
+            var count = document.getElementById('build_progress_count');
+            count.innerText = done + ' / ' + total;
+            if (done >= total) {
+              count.parentNode.innerHTML = 'すべてのデータ詳細の作成が完了しました。<a href="./index.html">再読み込み</a>してください。';
+            } else {
+              setTimeout(loadProgress, 2000);
+            }
+          }
+
+          function loadProgress() {
+            var old = document.getElementById('progress_script');
+            if (old) {
+              old.parentNode.removeChild(old);
+            }
+            var script = document.createElement('script');
+            script.id = 'progress_script';
+            script.src = './progress.js?' + Date.now();
+            script.onerror = function () { setTimeout(loadProgress, 2000); };
+            document.head.appendChild(script);
+          }
+
+          loadProgress();
+        </script>
+    """
+
+    # カードの差し込み項目(仮想スクロール用のjsonもこの順で出力する)
+    card_fields = ["HTMLファイル", "データID", "データ名", "ファイル数", "データ番号", "試料ID", "データ説明", "登録日時", "サムネイル", "サムネイル寸法", "サムネイルスプライト"]
+    cards = []
+    # 作成途中の一覧ではスプライトの作成を待たずに個別の画像を表示する
+    sprites = {} if progress else create_thumbnail_sprites(out_sink, data_info)
+    for d in data_info:
+        # 1件のデータの不備で全体が止まらないように、失敗した場合はエラーのカードを表示する
+        try:
+            if d.get("errors"):
+                cards.append(get_error_card_data(d))
+            else:
+                cards.append(get_card_data(d))
+                cards[-1]["サムネイルスプライト"] = sprites.get(d["id"], "")
+        except Exception:
+            add_error(d, "データ一覧のカードの作成", partial=True)
+            cards.append(get_error_card_data(d))
+
+    if INDEX_MODE == "virtual" or (INDEX_MODE == "auto" and len(data_info) > VIRTUAL_INDEX_THRESHOLD):
+        # カードはjsonに分割して出力し、表示範囲のみブラウザで作成する
+        create_card_chunks(out_sink, [[c[k] for k in card_fields] for c in cards])
+        card = '<div id="card_grid" class="col-12 virtual-grid"></div>'
+        script = virtual_template.replace("{{Card_Fields}}", json.dumps(card_fields, ensure_ascii=False))
+        script = script.replace("{{Card_Template}}", json.dumps(card_template, ensure_ascii=False))
+        script = script.replace("{{Thumbnail_Template}}", json.dumps(thumbnail_template, ensure_ascii=False))
+        script = script.replace("{{No_Thumbnail_Template}}", json.dumps(no_thumbnail_template, ensure_ascii=False))
+        script = script.replace("{{Sprite_Template}}", json.dumps(sprite_template, ensure_ascii=False))
+        script = script.replace("{{Chunk_Size}}", str(CARD_CHUNK_SIZE))
+        script = script.replace("{{Row_Height}}", str(VIRTUAL_ROW_HEIGHT))
+    else:
+        card = ""
+        for i, c in enumerate(cards):
+            card += card_template
+            for k in card_fields:
+                card = card.replace(f"{{{{{k}}}}}", c[k])
+            if c["サムネイル"] == "":
+                card = card.replace("{{サムネイル画像}}", no_thumbnail_template)
+            elif c["サムネイルスプライト"]:
+                card = card.replace("{{サムネイル画像}}", sprite_template.replace("{{サムネイルスプライト}}", c["サムネイルスプライト"]))
+            else:
+                thumb = thumbnail_template.replace("{{サムネイル}}", c["サムネイル"]).replace("{{サムネイル寸法}}", c["サムネイル寸法"])
+                # 最初の1行(3件)以外は表示範囲に近づいてから読み込む
+                if i >= 3:
+                    thumb = thumb.replace("<img ", '<img loading="lazy" ')
+                card = card.replace("{{サムネイル画像}}", thumb)
+        script = ""
+
+    html = base_template.replace("{{カード}}", card)
+    html = html.replace("{{スタイルシート}}", STYLE_FILE)
+    html = html.replace("{{一覧スクリプト}}", script)
+    html = html.replace("{{Data_Num}}", str(len(data_info)))
+
+    # 部分プレビューの場合はその旨を表示する
+    if partial:
+        html = html.replace("{{部分プレビュー}}", f'<div class="alert alert-warning py-1 mb-3">部分プレビューです。条件({partial})に該当する {len(data_info)} 件のみ表示しています。</div>')
+    else:
+        html = html.replace("{{部分プレビュー}}", "")
+
+    # 残りのデータ詳細を作成中の場合は、作成状況を読み込み直して表示する
+    if progress:
+        html = html.replace("{{作成状況}}", progress_template.replace("{{Data_Num}}", str(len(data_info))))
+    else:
+        html = html.replace("{{作成状況}}", "")
+    html = html.replace("{{検索パターン}}", SEARCH_TOKEN_PATTERN.replace("\\", "\\\\"))
+    html = html.replace("{{詳細URL}}", json.dumps(get_detail_url("{id}")))
+
+    # 圧縮する場合
+    if COMPRESS:
+        html = html.replace("\n", "").replace("  ", "")
+
+    out_sink.write_text(out_html_file, html)
+
+    create_search_index(out_sink, data_info)
+
+def get_detail_url(data_id):
+    """ データ詳細ページのURLの取得 """
+
+    if DETAIL_MODE == "viewer":
+        return f"./viewer.html?id={data_id}"
+    return f"./{data_id}.html"
+
+def get_card_data(data):
+    """ データ一覧のカードに表示する値の取得 """
+
+    return {"HTMLファイル": get_detail_url(data["id"]),
+            "データID": data["id"],
+            "データ名": get_dataname(data),
+            "ファイル数": str(get_file_len(data, ["raw","nonshared_raw","meta","structured","main_image","other_image"])),
+            "データ番号": get_data_no(data["id"]),
+            "試料ID": get_sample_id(data),
+            "データ説明": get_value(data["invoice"]["basic"]["description"]),
+            "登録日時": datetime.strptime(data["invoice"]["basic"]["dateSubmitted"], "%Y-%m-%d").strftime("%Y-%m-%d 0:00:00 JST"),
+            "サムネイル": get_thumbnail(data),
+            "サムネイル寸法": get_thumbnail_attrs(data),
+            "サムネイルスプライト": ""}
+
+def get_error_card_data(data):
+    """ エラーが発生したデータのカードに表示する値の取得 """
+
+    # カードだけが作成できなかった場合は、データ詳細ページはそのまま表示できる
+    return {"HTMLファイル": f"./{data['id']}.html" if data.get("errors") else get_detail_url(data["id"]),
+            "データID": data["id"],
+            "データ名": f"エラー_{data['id']}",
+            "ファイル数": "0",
+            "データ番号": get_data_no(data["id"]),
+            "試料ID": "",
+            "データ説明": "[エラー] " + " / ".join(html_escape(e) for e in data.get("errors", []) + data.get("partial_errors", [])),
+            "登録日時": "",
+            "サムネイル": "",
+            "サムネイル寸法": "",
+            "サムネイルスプライト": ""}
+
+def create_errorPage(out_sink, data):
+    """ エラーが発生したデータのページの作成 """
+
+    base_template = """
+        <!DOCTYPE html>
+        <html lang="en">
+        <head>
+          <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
+          <title>RDE/Dataset View</title>
+          <meta name="viewport" content="width=device-width, initial-scale=1">
+          <link rel="stylesheet" href="{{スタイルシート}}">
+        </head>
+        <body>
+          <main class="contents">
+            <div class="container page-content">
+              <h2>データ詳細 : プレビューデータセット : エラー_{{データID}}</h2>
+              <div class="form-buttons mt-3 d-flex justify-content-end">
+                <a href="./index.html"><button type="button" class="btn btn-secondary btn-144px ml-2">データ一覧へ戻る</button></a>
+              </div>
+              <div class="alert text-danger mt-3">
+                <div>このデータのプレビューの作成中にエラーが発生しました。詳細はpreview.logを確認してください。</div>
+                <ul>{{エラー}}</ul>
               </div>
             </div>
-            <div class="card-footer bg-transparent">
-              <p class="card-text text-right mb-2"><small class="text-muted">登録日時 {{登録日時}}</small></p>
-              <p class="card-text text-right"><small class="text-muted">データID N/A</small></p>
-            </div>
-          </div>
-        </div>
+          </main>
+        </body>
+        </html>
     """
 
-    card = ""
-    for d in data_info:
-        if len(d["invoice"]["sample"]["names"]) > 0:
-            sample_id = d["invoice"]["sample"]["names"][0]
-        else:
-            sample_id = d["invoice"]["sample"]["sampleId"]
-
-        card += card_template.replace("{{HTMLファイル}}", f"./{d['id']}.html")
-        card = card.replace("{{データ名}}", d["invoice"]["basic"]["dataName"] if d["invoice"]["basic"]["dataName"] else f"プレビュー_{d['id']}")
-        card = card.replace("{{ファイル数}}", str(get_file_len(d, ["raw","nonshared_raw","meta","structured","main_image","other_image"])))
-        card = card.replace("{{データ番号}}", f"{int(d['id'])}")
-        card = card.replace("{{試料ID}}", sample_id)
-        card = card.replace("{{データ説明}}", get_value(d["invoice"]["basic"]["description"]))
-        card = card.replace("{{登録日時}}", datetime.strptime(d["invoice"]["basic"]["dateSubmitted"], "%Y-%m-%d").strftime("%Y-%m-%d 0:00:00 JST"))
-        thumb_img = get_thumbnail(d)
-        if thumb_img == "":
-            thumbnail = """
-                <div class="border d-flex align-items-center justify-content-center no-image white" style="width: 250px; height: 250px;">
-                  <div class="text-left" style="font-size: 2.5rem; line-height: 3rem;">
-                    <div>No</div>
-                    <div>Image</div>
-                  </div>
-                </div>
-            """
-        else:
-            thumbnail = f"""
-                <span>
-                  <img id="thumbnailImg" class="image" src="{thumb_img}">
-                </span>
-            """
-        card = card.replace("{{サムネイル画像}}", thumbnail)
+    errors = "".join(f'<li class="white-space-pre-line break-word">{html_escape(e)}</li>' for e in data.get("errors", []))
+    html = base_template.replace("{{データID}}", data["id"])
+    html = html.replace("{{スタイルシート}}", STYLE_FILE)
+    html = html.replace("{{エラー}}", errors)
 
-    html = base_template.replace("{{カード}}", card)
-    html = html.replace("{{Data_Num}}", str(len(data_info)))
+    # 圧縮する場合
+    if COMPRESS:
+        html = html.replace("\n", "").replace("  ", "")
+
+    out_sink.write_text(f"{data['id']}.html", html)
+
+def create_matrixPage(out_sink, matrix, metadef_data):
+    """ メタデータ一覧(データ×メタデータ項目の表)の作成 """
+
+    base_template = """
+        <!DOCTYPE html>
+        <html lang="en">
+        <head>
+          <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
+          <title>RDE/Dataset View</title>
+          <meta name="viewport" content="width=device-width, initial-scale=1">
+          <link rel="stylesheet" href="{{スタイルシート}}">
+          <script>
+            var DETAIL_URL = {{Detail_Url}};
+            var matrix = {data: null, page: 0, pageSize: {{Page_Size}}, columnWidth: {{Column_Width}}, idWidth: 240, range: '', pending: false};
+
+            function escapeHtml(text) {
+              return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+            }
+
+            function rdeMatrix(data) {
+              matrix.data = data;
+              document.getElementById('matrix_count').innerText = data.ids.length + ' 件 × ' + data.columns.length + ' 項目';
+              document.getElementById('matrix_view').addEventListener('scroll', function () {
+                if (!matrix.pending) {
+                  matrix.pending = true;
+                  requestAnimationFrame(function () {
+                    matrix.pending = false;
+                    renderMatrix(false);
+                  });
+                }
+              });
+              renderMatrix(true);
+            }
+
+            function cellValue(column, row) {
+              var code = column.codes[row];
+              return code < 0 ? '' : column.values[code];
+            }
+
+            function columnTitle(column) {
+              return column.ja + (column.unit ? ' (' + column.unit + ')' : '');
+            }
+
+            function pageMatrix(step) {
+              if (matrix.data === null) {
+                return;
+              }
+              var pages = Math.max(1, Math.ceil(matrix.data.ids.length / matrix.pageSize));
+              matrix.page = Math.min(pages - 1, Math.max(0, matrix.page + step));
+              renderMatrix(true);
+            }
+
+            function renderMatrix(force) {
+              var data = matrix.data;
+              var view = document.getElementById('matrix_view');
+              var width = matrix.columnWidth;
+              var count = data.columns.length;
+              var first = Math.max(0, Math.floor(view.scrollLeft / width) - 1);
+              var last = Math.min(count, first + Math.ceil(view.clientWidth / width) + 2);
+              var start = matrix.page * matrix.pageSize;
+              var end = Math.min(data.ids.length, start + matrix.pageSize);
+              var range = matrix.page + ':' + first + ':' + last;
+              if (!force && range === matrix.range) {
+                return;
+              }
+              matrix.range = range;
+
+              var html = '<table class="table table-sm matrix-table" style="width: ' + (matrix.idWidth + count * width) + 'px;">';
+              html += '<colgroup><col style="width: ' + matrix.idWidth + 'px;"><col style="width: ' + (first * width) + 'px;">';
+              for (var c = first; c < last; c++) {
+                html += '<col style="width: ' + width + 'px;">';
+              }
+              html += '<col style="width: ' + ((count - last) * width) + 'px;"></colgroup>';
+              html += '<thead><tr><th class="matrix-id">データ</th><th></th>';
+              for (var c = first; c < last; c++) {
+                html += '<th title="' + escapeHtml(data.columns[c].key + ' / ' + data.columns[c].en) + '">' + escapeHtml(columnTitle(data.columns[c])) + '</th>';
+              }
+              html += '<th></th></tr></thead><tbody>';
+              for (var i = start; i < end; i++) {
+                html += '<tr><td class="matrix-id"><a href="' + DETAIL_URL.split('{id}').join(encodeURIComponent(data.ids[i])) + '">' + escapeHtml(data.ids[i] + ' ' + data.names[i]) + '</a></td><td></td>';
+                for (var c = first; c < last; c++) {
+                  var value = cellValue(data.columns[c], i);
+                  html += '<td title="' + escapeHtml(value) + '">' + escapeHtml(value) + '</td>';
+                }
+                html += '<td></td></tr>';
+              }
+              html += '</tbody></table>';
+              view.innerHTML = html;
+              document.getElementById('matrix_page').innerText = (data.ids.length === 0 ? 0 : start + 1) + ' - ' + end + ' / ' + data.ids.length;
+            }
+
+            function csvField(text) {
+              text = String(text);
+              return /[",\\r\\n]/.test(text) ? '"' + text.replace(/"/g, '""') + '"' : text;
+            }
+
+            function exportMatrix() {
+              var data = matrix.data;
+              if (data === null) {
+                return;
+              }
+              var lines = [['データID', 'データ名'].concat(data.columns.map(columnTitle)).map(csvField).join(',')];
+              for (var i = 0; i < data.ids.length; i++) {
+                var row = [data.ids[i], data.names[i]];
+                for (var c = 0; c < data.columns.length; c++) {
+                  row.push(cellValue(data.columns[c], i));
+                }
+                lines.push(row.map(csvField).join(','));
+              }
+              var a = document.createElement('a');
+              a.href = URL.createObjectURL(new Blob(['\\ufeff' + lines.join('\\r\\n') + '\\r\\n'], {type: 'text/csv'}));
+              a.download = 'metadata.csv';
+              document.body.appendChild(a);
+              a.click();
+              document.body.removeChild(a);
+            }
+          </script>
+        </head>
+        <body>
+          <main class="contents">
+            <div class="container page-content">
+              <h2>メタデータ一覧: プレビューデータセット</h2>
+              <div class="form-buttons mt-3 d-flex justify-content-end">
+                <button type="button" class="btn btn-144px btn-primary ml-2" onclick="exportMatrix();">CSV出力</button>
+                <a href="./index.html"><button type="button" class="btn btn-secondary btn-144px ml-2">データ一覧へ戻る</button></a>
+              </div>
+              <div class="d-flex align-items-center mt-3">
+                <span id="matrix_count"></span>
+                <span class="ml-auto" id="matrix_page"></span>
+                <button type="button" class="btn btn-link" onclick="pageMatrix(-1);">前へ</button>
+                <button type="button" class="btn btn-link" onclick="pageMatrix(1);">次へ</button>
+              </div>
+              <div id="matrix_view" class="matrix-view"></div>
+            </div>
+          </main>
+          <script src="matrix.js"></script>
+        </body>
+        </html>
+    """
+
+    html = base_template.replace("{{Page_Size}}", str(MATRIX_PAGE_SIZE))
+    html = html.replace("{{スタイルシート}}", STYLE_FILE)
+    html = html.replace("{{Column_Width}}", str(MATRIX_COLUMN_WIDTH))
+    html = html.replace("{{Detail_Url}}", json.dumps(get_detail_url("{id}")))
 
     # 圧縮する場合
     if COMPRESS:
         html = html.replace("\n", "").replace("  ", "")
 
-    with open(out_html_file, "w", encoding="utf_8") as f:
-        f.write(html)
+    # file://でも読み込めるようにjsonではなくscriptとして出力する
+    data = json.dumps(matrix.to_dict(metadef_data), ensure_ascii=False, separators=(",", ":"))
+    out_sink.write_text("matrix.js", f"rdeMatrix({data});\n")
+    out_sink.write_text("matrix.html", html)
 
-def create_css(out_root_dir):
-    """ CSSファイルの作成 """
+def get_progress_writer(out_sink, offset, total):
+    """ 作成状況の書き込み関数の取得(index.htmlから定期的に読み込まれる) """
 
-    out_css_file = out_root_dir.joinpath("style.css")
+    last = [0.0]
+
+    def write_progress(n):
+        # 書き込みが多くなりすぎないように1秒おきにまとめる
+        done = offset + n
+        if done < total and time.time() - last[0] < 1:
+            return
+        last[0] = time.time()
+        out_sink.write_text("progress.js", f"rdeProgress({done}, {total});\n")
+
+    return write_progress
+
+def create_thumbnail_sprites(out_sink, data_info):
+    """ データ一覧のサムネイルをまとめたスプライトの作成(データIDごとのカードに指定するstyleを返す) """
+
+    if not THUMBNAIL_SPRITE:
+        return {}
+    if Image is None:
+        write_log("[Info] Pillowがインストールされていないため、サムネイルのスプライトは作成しません。")
+        return {}
+
+    # 一覧の並び順でSPRITE_SIZE件ずつ1枚にまとめる(入力のサムネイルが変わらなければ前回のものを使う)
+    sheets = []
+    for n in range(0, len(data_info), SPRITE_SIZE):
+        thumbs = []
+        for d in data_info[n:n+SPRITE_SIZE]:
+            thumb = d["files"].get("thumbnail", [])
+            if not d.get("errors") and len(thumb) > 0:
+                thumbs.append((d, thumb[0]))
+        if thumbs:
+            fingerprint = get_fingerprint([SPRITE_CELL, [[d["id"], f.get("path"), f["name"], f["bytes"], f.get("mtime")] for d, f in thumbs]])
+            sheets.append((f"{n // SPRITE_SIZE:05d}", fingerprint, thumbs))
+
+    def try_create_sprite(sheet):
+        # 1枚の作成の失敗で全体が止まらないように、失敗した場合は個別の画像を表示する
+        key, fingerprint, thumbs = sheet
+        record = out_sink.get_done("sprite", key, fingerprint)
+        if record is not None:
+            return record["name"], record["cells"], True
+        try:
+            out_sink.begin("sprite", key, fingerprint)
+            name = f"sprites/{fingerprint}.jpg"
+            cells = create_sprite(out_sink, name, thumbs)
+            out_sink.commit(name=name, cells=cells)
+            return name, cells, False
+        except Exception:
+            write_log(f"[Error] サムネイルのスプライト {key} の作成に失敗しました。処理を続行します。\n{traceback.format_exc()}")
+            return None, {}, False
+
+    with ThreadPoolExecutor(max_workers=SPRITE_WORKERS) as executor:
+        results = list(executor.map(try_create_sprite, sheets))
+
+    sprites = {}
+    for name, cells, reused in results:
+        for data_id, (x, y) in cells.items():
+            sprites[data_id] = f"background-image: url(./{name}); background-position: {-x}px {-y}px;"
+    if results:
+        reused = sum(1 for name, cells, reused in results if reused)
+        write_log(f"[Info] サムネイル {len(sprites)} 件をスプライト {len(results)} 枚にまとめました。(前回作成済み {reused} 枚)")
+    return sprites
+
+def create_sprite(out_sink, name, thumbs):
+    """ サムネイルを縮小して1枚の画像に並べる(データIDごとの左上の座標を返す) """
+
+    width, height = SPRITE_CELL
+    rows = (len(thumbs) + SPRITE_COLUMNS - 1) // SPRITE_COLUMNS
+    sheet = Image.new("RGB", (width * min(len(thumbs), SPRITE_COLUMNS), height * rows), "white")
+    cells = {}
+    for d, f in thumbs:
+        ifile = d["dir"].joinpath("thumbnail", f["name"])
+        try:
+            with ifile.open("rb") as fi:
+                im = Image.open(fi)
+                # JPEGは縮小しながらデコードして読み込みを軽くする
+                im.draft("RGB", SPRITE_CELL)
+                # 表示(object-fit: contain)と同じく、小さい画像も枠に合わせて拡大する
+                im = ImageOps.contain(ImageOps.exif_transpose(im).convert("RGBA"), SPRITE_CELL)
+        except Exception:
+            # 表示できない画像はスプライトに含めず、個別の画像のまま表示する
+            write_log(f"[Error] サムネイル {ifile} をスプライトに追加できませんでした。")
+            continue
+        i = len(cells)
+        x, y = (i % SPRITE_COLUMNS) * width, (i // SPRITE_COLUMNS) * height
+        # 枠の中央に置く
+        sheet.paste(im, (x + (width - im.width) // 2, y + (height - im.height) // 2), im)
+        cells[d["id"]] = [x, y]
+
+    data = io.BytesIO()
+    sheet.save(data, "JPEG", quality=85, optimize=True)
+    out_sink.write_bytes(name, data.getvalue())
+    return cells
+
+def create_card_chunks(out_sink, cards):
+    """ 仮想スクロール用のカードデータの分割出力 """
+
+    # file://でも読み込めるようにjsonではなくscriptとして出力する
+    for n in range(0, max(len(cards), 1), CARD_CHUNK_SIZE):
+        chunk = json.dumps(cards[n:n+CARD_CHUNK_SIZE], ensure_ascii=False, separators=(",", ":"))
+        out_sink.write_text(f"cards/cards_{n // CARD_CHUNK_SIZE:05d}.js", f"rdeCardChunk({n // CARD_CHUNK_SIZE}, {chunk});\n")
+
+def get_search_tokens(text):
+    """ 検索用トークンの取得 """
+
+    tokens = set()
+    for t in re.findall(SEARCH_TOKEN_PATTERN, str(text).lower()):
+        if t.isascii():
+            tokens.add(t)
+        else:
+            # 日本語などは単語の区切りがないため、部分一致できるように接尾辞も登録する
+            tokens.update(t[i:] for i in range(len(t)))
+    return tokens
+
+def create_search_index(out_sink, data_info):
+    """ データ一覧の検索インデックスの作成 """
+
+    out_js_file = "search_index.js"
+
+    entries = []
+    prefix = {}
+    for i, d in enumerate(data_info):
+        try:
+            entry = [d["id"], get_dataname(d), get_sample_id(d),
+                     get_value(d["invoice"]["basic"]["description"]), d["invoice"]["basic"]["dateSubmitted"]]
+        except Exception:
+            entry = [d["id"], f"エラー_{d['id']}", "", "", ""]
+        entries.append(entry)
+
+        keys = set()
+        for t in get_search_tokens(" ".join(entry[1:])):
+            keys.update(t[:n] for n in range(1, SEARCH_PREFIX_LEN+1))
+        for k in sorted(keys):
+            prefix.setdefault(k, []).append(i)
+
+    # 番号は昇順なので差分で保持してサイズを抑える
+    for k, ids in prefix.items():
+        prefix[k] = [ids[0]] + [b - a for a, b in zip(ids, ids[1:])]
+
+    # file://でも読み込めるようにjsonではなくscriptとして出力する
+    index = json.dumps({"n":SEARCH_PREFIX_LEN, "entries":entries, "prefix":prefix}, ensure_ascii=False, separators=(",", ":"))
+    out_sink.write_text(out_js_file, f"window.RDE_SEARCH_INDEX = {index};\n")
+
+def create_assets(out_sink):
+    """ ヘッダー・フッターのロゴなどの画像の作成(外部のサーバーを参照せずに表示できるように同梱する) """
+
+    svg = """<svg xmlns="http://www.w3.org/2000/svg" width="{{幅}}" height="{{高さ}}" viewBox="0 0 {{幅}} {{高さ}}">{{内容}}</svg>"""
+    text = """<text x="{{x}}" y="{{y}}" font-family="Arial, Helvetica, sans-serif" font-size="{{サイズ}}" font-weight="700" fill="{{色}}" text-anchor="middle" dominant-baseline="central">{{文字}}</text>"""
+
+    def create_logo(width, height, content):
+        return svg.replace("{{幅}}", str(width)).replace("{{高さ}}", str(height)).replace("{{内容}}", content)
+
+    def create_text(x, y, size, color, label):
+        return text.replace("{{x}}", str(x)).replace("{{y}}", str(y)).replace("{{サイズ}}", str(size)).replace("{{色}}", color).replace("{{文字}}", label)
+
+    assets = {
+        "RDE_logo.svg": create_logo(240, 90,
+            create_text(120, 38, 44, "#005bac", "RDE")
+            + create_text(120, 72, 13, "#555555", "Research Data Express")),
+        "dice.svg": create_logo(96, 32,
+            """<rect x="1" y="1" width="94" height="30" rx="4" fill="#ffffff" stroke="#005bac" stroke-width="2"/>"""
+            + create_text(48, 16, 16, "#005bac", "DICE")),
+        "dice_nims.svg": create_logo(160, 46,
+            """<rect width="160" height="46" fill="#ffffff"/>"""
+            + create_text(80, 23, 20, "#005bac", "NIMS DICE")),
+        "arim.svg": create_logo(160, 46,
+            """<rect width="160" height="46" fill="#ffffff"/>"""
+            + create_text(80, 23, 20, "#e4007f", "ARIM")),
+        "usage.svg": create_logo(16, 16,
+            """<circle cx="8" cy="8" r="7" fill="none" stroke="#333333" stroke-width="1.5"/>"""
+            + create_text(8, 8.5, 11, "#333333", "?")),
+    }
+    for name, data in assets.items():
+        out_sink.write_text(f"assets/{name}", data)
+
+def create_css(out_sink, used=None):
+    """ CSSファイルの作成(usedを指定した場合は使われていないルールを除く)、作成したファイル名を返す """
+
+    out_css_file = "style.css"
     css = """
     :root {
         --blue: #007bff;
@@ -2412,7 +4935,7 @@ def create_css(out_root_dir):
     }
     
     .navi>ul li.navilink.usage a:before {
-        background-image: url(https://rde.nims.go.jp/_nuxt/img/usage.e57c944.png);
+        background-image: url(assets/usage.svg);
     }
     
     .container-fix {
@@ -2455,6 +4978,11 @@ def create_css(out_root_dir):
         width: 286px !important;
     }
     
+    .sprite {
+        display: inline-block;
+        background-repeat: no-repeat;
+    }
+    
     .image2 {
         height: 80px;
         width: 120px !important;
@@ -2526,6 +5054,13 @@ def create_css(out_root_dir):
         padding: 0.3rem;
     }
     
+    .preview-box {
+        max-height: 400px;
+        overflow: auto;
+        font-size: 80%;
+        white-space: pre;
+    }
+    
     .table-responsive {
         display: block;
         width: 100%;
@@ -2723,6 +5258,19 @@ def create_css(out_root_dir):
         object-fit: contain;
     }
     
+    .tile-viewer {
+        position: relative;
+        overflow: hidden;
+        cursor: grab;
+        background-color: rgb(255, 255, 255);
+    }
+    
+    .tile-viewer .tile {
+        position: absolute;
+        max-width: none;
+        pointer-events: none;
+    }
+    
     .thumbnail-position {
         display: block;
     }
@@ -2748,42 +5296,551 @@ def create_css(out_root_dir):
     .ban {
         cursor: not-allowed;
     }
+
+    .virtual-grid {
+        position: relative;
+    }
+
+    .virtual-row {
+        position: absolute;
+        left: 0;
+        right: 0;
+        margin: 0;
+    }
+
+    .virtual-row .card {
+        overflow: hidden;
+    }
+
+    .matrix-view {
+        overflow-x: auto;
+        margin-top: 0.5rem;
+    }
+
+    .matrix-table {
+        table-layout: fixed;
+        max-width: none;
+    }
+
+    .matrix-table td,
+    .matrix-table th {
+        overflow: hidden;
+        text-overflow: ellipsis;
+        white-space: nowrap;
+    }
+
+    .matrix-table .matrix-id {
+        position: sticky;
+        left: 0;
+        z-index: 1;
+        background-color: #fff;
+    }
+
+    .alert-warning {
+        color: #856404;
+        background-color: #fff3cd;
+        border-color: #ffeeba;
+    }
+
+    .search-results {
+        max-height: 240px;
+        overflow-y: auto;
+        padding-left: 1.25rem;
+        margin-bottom: 0;
+    }
+
+    .search-hit .card {
+        border-color: var(--primary);
+        box-shadow: 0 0 0 0.2rem rgba(0, 123, 255, 0.25);
+    }
     """
 
+    if used is not None:
+        # 内容が変わればファイル名も変わるため、ブラウザは期限なくキャッシュしてよい
+        full_size = len(css.encode("utf_8"))
+        css = prune_css(css, used)
+        if COMPRESS:
+            css = css.replace("\n", "").replace("  ", "")
+        out_css_file = f"style.{hashlib.blake2b(css.encode('utf_8'), digest_size=8).hexdigest()}.css"
+        out_sink.write_text(out_css_file, css)
+        size = len(css.encode("utf_8"))
+        write_log(f"[Info] 使われていないCSSのルールを除き、{out_css_file} を作成しました。({format_file_size(full_size)} → {format_file_size(size)}、{1 - size / full_size:.1%} 削減)")
+        return out_css_file
+
     # 圧縮する場合
     if COMPRESS:
         css = css.replace("\n", "").replace("  ", "")
-    with open(out_css_file, "w", encoding="utf_8") as f:
-        f.write(css)
+    out_sink.write_text(out_css_file, css)
+    return out_css_file
+
+def prune_css(css, used):
+    """ 使われていないクラス名・IDを含むセレクタの除去 """
+
+    out = []
+    pos = 0
+    while True:
+        start = css.find("{", pos)
+        if start < 0:
+            break
+        prelude = css[pos:start].strip()
+
+        # 対応する閉じ括弧を探す(@mediaなどの入れ子も扱う)
+        depth = 0
+        for end in range(start, len(css)):
+            if css[end] == "{":
+                depth += 1
+            elif css[end] == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+        body = css[start+1:end]
+        pos = end + 1
+
+        if prelude.startswith(("@media", "@supports")):
+            inner = prune_css(body, used)
+            if inner.strip():
+                out.append(f"    {prelude} {{\n{inner}    }}\n")
+        elif prelude.startswith("@"):
+            out.append(f"    {prelude} {{{body}}}\n")
+        else:
+            selectors = [sel.strip() for sel in prelude.split(",")]
+            selectors = [sel for sel in selectors if is_used_selector(sel, used)]
+            if selectors:
+                out.append("    " + ",\n    ".join(selectors) + f" {{{body}}}\n\n")
+    return "".join(out)
+
+def is_used_selector(selector, used):
+    """ セレクタ中のクラス名・IDがすべて使われているかの判定 """
+
+    # 属性セレクタの値と否定の条件は対象外
+    selector = re.sub(r"\[[^\]]*\]|:not\([^)]*\)", "", selector)
+    return all(name in used for name in re.findall(r"[.#]([A-Za-z_][\w-]*)", selector))
+
+def check_external_refs(name, text, reported):
+    """ 出力したページが外部のURLを参照していないかの確認(同じURLは一度だけ記録する) """
+
+    if not name.endswith((".html", ".js", ".css")):
+        return
+    # svgの名前空間の宣言以外に"//"が無ければ調べる必要はない
+    if text.count("//") == text.count("http://www.w3.org/2000/svg"):
+        return
+    for m in EXTERNAL_REF_PATTERN.finditer(text):
+        url = m.group(1)
+        if url.startswith("http://www.w3.org/") or url in reported:
+            continue
+        reported.add(url)
+        write_log(f"[Error] {name} が外部のURLを参照しています。ネットワークに接続できない環境では表示が遅くなります。({url})")
+
+def get_fingerprint(data):
+    """ 入力データのハッシュ値の取得(再開時に前回から変わっていないかの判定に使う) """
+
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode("utf_8"), digest_size=16).hexdigest()
+
+def get_file_hash(ifile):
+    """ ファイル内容のハッシュ値の取得 """
+
+    h = hashlib.blake2b(digest_size=16)
+    with ifile.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def get_image_size(ifile):
+    """ 画像ファイルの幅・高さの取得(PNG/JPEG/GIF/TIFFのヘッダーのみ読み込み、画像全体はデコードしない) """
+
+    with ifile.open("rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return list(struct.unpack(">II", head[16:24]))
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return list(struct.unpack("<HH", head[6:10]))
+        if head[:4] in (b"II*\x00", b"MM\x00*"):
+            tags = read_tiff_tags(f, 0, (256, 257, 274))
+            if 256 in tags and 257 in tags:
+                return get_oriented_size(tags[256], tags[257], tags.get(274, 1))
+            return None
+        if head[:2] != b"\xff\xd8":
+            return None
+
+        # JPEGはSOFセグメントまでマーカーを読み飛ばす(Exifの回転はブラウザの表示に合わせて幅と高さを入れ替える)
+        orientation = 1
+        pos = 2
+        while True:
+            f.seek(pos)
+            marker = f.read(4)
+            if len(marker) < 4 or marker[0] != 0xFF:
+                return None
+            if marker[1] == 0xFF:
+                pos += 1
+                continue
+            length = struct.unpack(">H", marker[2:4])[0]
+            if marker[1] in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                sof = f.read(5)
+                if len(sof) < 5:
+                    return None
+                height, width = struct.unpack(">HH", sof[1:5])
+                return get_oriented_size(width, height, orientation)
+            if marker[1] == 0xE1 and f.read(6) == b"Exif\x00\x00":
+                orientation = read_tiff_tags(f, pos + 10, (274,)).get(274, 1)
+            if marker[1] == 0xD9:
+                return None
+            pos += 2 + length
+
+def read_tiff_tags(f, base, wanted):
+    """ TIFF形式(TIFFファイル・JPEGのExif)の先頭のIFDから指定したタグの値を取得 """
+
+    f.seek(base)
+    head = f.read(8)
+    if len(head) < 8:
+        return {}
+    endian = "<" if head[:2] == b"II" else ">"
+    f.seek(base + struct.unpack(endian + "I", head[4:8])[0])
+    count = f.read(2)
+    if len(count) < 2:
+        return {}
+    tags = {}
+    for _ in range(min(struct.unpack(endian + "H", count)[0], 1000)):
+        entry = f.read(12)
+        if len(entry) < 12:
+            break
+        tag, kind = struct.unpack(endian + "HH", entry[:4])
+        if tag in wanted and kind in (3, 4):
+            tags[tag] = struct.unpack(endian + ("H" if kind == 3 else "I"), entry[8:10] if kind == 3 else entry[8:12])[0]
+    return tags
+
+def get_oriented_size(width, height, orientation):
+    """ Exifの回転(5〜8は90度回転)を反映した幅・高さの取得 """
+
+    if orientation in (5, 6, 7, 8):
+        return [height, width]
+    return [width, height]
+
+def get_image_attrs(f):
+    """ 画像タグに付ける幅・高さの属性の取得(読み込み前に表示領域を確保して再レイアウトを防ぐ) """
+
+    if not f.get("dims"):
+        return ""
+    return f' width="{f["dims"][0]}" height="{f["dims"][1]}"'
+
+def get_tile_preview(f):
+    """ タイルに分割した画像の全体を表示するタイル(最も縮小した段階)のパスの取得 """
+
+    if not f.get("tiles"):
+        return ""
+    return f"{f['tiles'][0]}/{f['tiles'][3] - 1}/0_0.jpg"
+
+def create_tile_pyramids(out_sink, data_info, root_dir):
+    """ 大きな画像のタイル分割(前回までの出力フォルダに同じ画像のタイルがあればそれを使う) """
+
+    if not TILE_PYRAMID:
+        return
+
+    # 同じ内容の画像(保存先のハッシュ値が同じ画像)は1度だけ分割する
+    targets = {}
+    for d in data_info:
+        for dr in ["main_image", "other_image"]:
+            for f in d["files"].get(dr, []):
+                if f.get("dims") and max(f["dims"]) > TILE_THRESHOLD and "path" in f:
+                    targets.setdefault(Path(f["path"]).stem, []).append((d, dr, f))
+    if not targets:
+        return
+    if Image is None:
+        write_log(f"[Info] Pillowがインストールされていないため、大きな画像 {len(targets)} 件はタイルに分割せずに表示します。")
+        return
+
+    # 顕微鏡画像などは展開後の画素数がPillowの上限(展開爆弾の判定)を超えるため、上限を外す
+    Image.MAX_IMAGE_PIXELS = None
+    out_root = getattr(out_sink, "root", None)
+    cache_dirs = sorted((p for p in root_dir.glob("output_preview*") if p.is_dir() and p != out_root), reverse=True)
+    created = 0
+    reused = 0
+    tile_pairs = []
+    info_pairs = []
+    for h, files in targets.items():
+        name = f"tiles/{h}"
+        levels = get_tile_levels(out_root.joinpath(name)) if out_root is not None else None
+        if levels is None:
+            for cache_dir in cache_dirs:
+                levels = get_tile_levels(cache_dir.joinpath(name))
+                if levels is not None:
+                    tile_pairs += [(p, p.relative_to(cache_dir).as_posix()) for p in cache_dir.joinpath(name).rglob("*.jpg")]
+                    info_pairs.append((cache_dir.joinpath(name, "info.json"), f"{name}/info.json"))
+                    break
+            if levels is not None:
+                reused += 1
+        else:
+            reused += 1
+        if levels is None:
+            d, dr, f = files[0]
+            try:
+                levels = create_tile_pyramid(out_sink, name, d["dir"].joinpath(dr, f["name"]))
+                created += 1
+            except Exception:
+                write_log(f"[Error] 画像 {f['name']} のタイル分割に失敗しました。元の画像のまま表示します。\n{traceback.format_exc()}")
+                continue
+        for d, dr, f in files:
+            f["tiles"] = [f"./{name}", f["dims"][0], f["dims"][1], levels, TILE_SIZE]
+
+    # 書きかけで中断しても完成したものと区別できるように、info.jsonは最後にコピーする
+    out_sink.copy_files(tile_pairs)
+    out_sink.copy_files(info_pairs)
+    write_log(f"[Info] 大きな画像 {created} 件をタイルに分割しました。(前回作成済み {reused} 件)")
+
+def get_tile_levels(tile_dir):
+    """ 作成済みのタイルの段階数の取得(未完成の場合やタイルの大きさが異なる場合はNone) """
+
+    try:
+        info = json.loads(tile_dir.joinpath("info.json").read_text(encoding="utf_8"))
+    except (OSError, ValueError):
+        return None
+    if info.get("tile") != TILE_SIZE:
+        return None
+    return info["levels"]
+
+def create_tile_pyramid(out_sink, name, ifile):
+    """ 画像を元の解像度から1/2ずつ縮小し、段階ごとにTILE_SIZE四方のタイルに分割する(段階数を返す) """
+
+    with ifile.open("rb") as f:
+        im = Image.open(f)
+        # 回転の指定がない場合は画像をコピーしないようにする
+        if im.getexif().get(274, 1) != 1:
+            im = ImageOps.exif_transpose(im)
+        im.load()
+    width, height = im.size
+
+    # 16bitなどの画像は全体の最小値〜最大値を0〜255に合わせる(帯ごとに変換しても明るさが揃うように先に求める)
+    extrema = im.getextrema() if im.mode.startswith("I") or im.mode == "F" else None
+
+    def save_tile(task):
+        # タイルのjpeg変換は並列に行う(Pillowは変換中にGILを解放する)
+        image, top, level, col, row = task
+        data = io.BytesIO()
+        image.crop((col * TILE_SIZE, row * TILE_SIZE - top, min((col + 1) * TILE_SIZE, image.width), min((row + 1) * TILE_SIZE - top, image.height))).save(data, "JPEG", quality=85)
+        out_sink.write_bytes(f"{name}/{level}/{col}_{row}.jpg", data.getvalue())
+
+    with ThreadPoolExecutor(max_workers=TILE_WORKERS) as executor:
+        # 元の解像度の段階はタイル1段分の帯ごとに表示用に変換し、変換後の全体の画像を持たないようにする
+        # (次の段階は帯を1/2に縮小して組み立て、元の画像はこの段階が終われば手放す)
+        cols = (width + TILE_SIZE - 1) // TILE_SIZE
+        reduced = None
+        for top in range(0, height, TILE_SIZE):
+            strip = get_display_image(im.crop((0, top, width, min(top + TILE_SIZE, height))), extrema)
+            list(executor.map(save_tile, [(strip, top, 0, col, top // TILE_SIZE) for col in range(cols)]))
+            if reduced is None:
+                reduced = Image.new(strip.mode, ((width + 1) // 2, (height + 1) // 2))
+            reduced.paste(strip.reduce(2), (0, top // 2))
+        im = reduced
+
+        level = 0
+        while max(width, height) > TILE_SIZE * 2 ** level:
+            level += 1
+            cols = (im.width + TILE_SIZE - 1) // TILE_SIZE
+            rows = (im.height + TILE_SIZE - 1) // TILE_SIZE
+            list(executor.map(save_tile, [(im, 0, level, col, row) for row in range(rows) for col in range(cols)]))
+            im = im.reduce(2)
+
+    # すべてのタイルを書き込んでから情報を書き込む(次回はこのファイルがあるタイルのみ使う)
+    out_sink.write_text(f"{name}/info.json", json.dumps({"width":width, "height":height, "levels":level + 1, "tile":TILE_SIZE}))
+    return level + 1
+
+def get_display_image(im, extrema=None):
+    """ 表示用(8bitのグレースケールまたはRGB)の画像への変換(extremaを指定した場合はその範囲を0〜255に合わせる) """
+
+    if im.mode in ("L", "RGB"):
+        return im
+    if im.mode.startswith("I") or im.mode == "F":
+        # 16bitなどの画像は最小値〜最大値を0〜255に合わせる
+        im = im.convert("F")
+        low, high = extrema or im.getextrema()
+        scale = 255 / max(high - low, 1e-12)
+        return im.point(lambda v: v * scale - low * scale).convert("L")
+    if im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info:
+        # 透過部分は白にする
+        im = im.convert("RGBA")
+        background = Image.new("RGB", im.size, "white")
+        background.paste(im, mask=im.getchannel("A"))
+        return background
+    return im.convert("RGB")
+
+def copy_file(ifile, out_file):
+    """ ファイルのコピー(更新されていないファイルはスキップする) """
+
+    stat = ifile.stat()
+    if out_file.exists():
+        out_stat = out_file.stat()
+        if out_stat.st_size == stat.st_size and out_stat.st_mtime_ns == stat.st_mtime_ns:
+            return 0
+
+    # 途中で中断しても壊れたファイルが残らないように一時ファイルに書いてから置き換える
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = out_file.with_name(f"{out_file.name}.tmp")
+    try:
+        with ifile.open("rb") as fi, open(tmp_file, "wb") as fo:
+            copied = 0
+            # カーネル内でコピーしてユーザー空間のバッファを経由しないようにする(アーカイブ内のファイルは展開しながら書き込む)
+            for func in [getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)]:
+                if func is None or isinstance(ifile, ArchivePath):
+                    continue
+                try:
+                    while copied < stat.st_size:
+                        if func is os.sendfile:
+                            n = func(fo.fileno(), fi.fileno(), copied, stat.st_size - copied)
+                        else:
+                            n = func(fi.fileno(), fo.fileno(), stat.st_size - copied, copied, copied)
+                        if n == 0:
+                            break
+                        copied += n
+                    break
+                except OSError:
+                    # 対応していないファイルシステムの場合は次の方法で最初からコピーする
+                    # (sendfileは出力先の現在位置に書き込むため、位置も先頭に戻す)
+                    copied = 0
+                    fo.truncate(0)
+                    fo.seek(0)
+            if copied < stat.st_size:
+                # カーネル内のコピーで途中まで書けた場合のみ続きから書く(アーカイブ内のファイルは位置を変えられない)
+                if copied > 0:
+                    fi.seek(copied)
+                    fo.seek(copied)
+                shutil.copyfileobj(fi, fo, 1024 * 1024)
+        os.utime(tmp_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_file, out_file)
+    except BaseException:
+        # 失敗した場合は書きかけの一時ファイルを残さない
+        tmp_file.unlink(missing_ok=True)
+        raise
+    return stat.st_size
 
-def copy_images(input_dir, out_root_dir, out_img_dir):
-    """ 画像フォルダのコピー """
+def get_copy_workers(ifile, out_dir):
+    """ コピーの並列数の取得 """
+
+    if COPY_WORKERS:
+        return COPY_WORKERS
+
+    # 別ボリューム(ネットワークドライブなど)への書き込みは待ち時間が長いため並列数を増やす
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if isinstance(ifile, ArchivePath):
+        ifile = ifile.archive.path
+    if os.stat(ifile).st_dev != os.stat(out_dir).st_dev:
+        return min(32, (os.cpu_count() or 1) * 8)
+    return min(16, (os.cpu_count() or 1) * 2)
+
+def copy_files(pairs):
+    """ ファイルの並列コピー(コピーに失敗した組を返す) """
+
+    if len(pairs) == 0:
+        return []
+
+    def try_copy_file(pair):
+        # 1ファイルのコピーの失敗で全体が止まらないようにする
+        try:
+            return copy_file(*pair)
+        except Exception:
+            write_log(f"[Error] ファイル {pair[0]} のコピーに失敗しました。処理を続行します。\n{traceback.format_exc()}")
+            return None
+
+    start = time.perf_counter()
+    workers = get_copy_workers(pairs[0][0], pairs[0][1].parent)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sizes = list(executor.map(try_copy_file, pairs))
+    elapsed = max(time.perf_counter() - start, 1e-6)
+
+    copied = [size for size in sizes if size]
+    failed = [pair for pair, size in zip(pairs, sizes) if size is None]
+    total = sum(copied)
+    write_log(f"[Info] ファイル {len(copied)} 件をコピーしました。(更新なし {len(pairs) - len(copied) - len(failed)} 件、失敗 {len(failed)} 件、"
+              f"{format_file_size(total)}、{total / 1024 / 1024 / elapsed:.1f} MB/s、並列数 {workers})")
+    return failed
+
+def copy_images(out_sink, data_info):
+    """ 画像ファイルのコピー """
 
     dirs = ["main_image", "other_image", "thumbnail"]
 
-    # データ一覧ページの並び順の関係でdividedから処理する
-    # dividedフォルダのコピー
-    data_id = "0000"
-    divided_dir = input_dir.joinpath("divided")
-    if divided_dir.exists():
-        for div in divided_dir.iterdir():
-            data_id = div.name
-            for d in dirs:
-                in_dir  = div.joinpath(d)
-                out_dir = out_img_dir.joinpath(div.name, d)
-                if in_dir.exists():
-                    if out_dir.exists():
-                        shutil.rmtree(out_dir)
-                    shutil.copytree(in_dir, out_dir)
-
-    # トップレベルの画像フォルダをコピー
-    for d in dirs:
-        in_dir  = input_dir.joinpath(d)
-        out_dir = out_img_dir.joinpath(f"{int(data_id)+1:04d}", d)
-        if in_dir.exists():
-            if out_dir.exists():
-                shutil.rmtree(out_dir)
-            shutil.copytree(in_dir, out_dir)
+    # 同じ画像が各dividedに含まれることが多いため、内容のハッシュ値で1つにまとめて保存する
+    targets = []
+    done = {}
+    skipped = 0
+    for d in data_info:
+        # 前回コピー済みで画像が変わっていないデータは、ハッシュ値を計算し直さずに保存先を引き継ぐ
+        fingerprint = get_fingerprint([[dr, f] for dr in dirs for f in d["files"].get(dr, [])])
+        record = out_sink.get_done("images", d["id"], fingerprint)
+        if record is not None:
+            for dr in dirs:
+                for f in d["files"].get(dr, []):
+                    if f"{dr}/{f['name']}" in record["paths"]:
+                        f["path"] = record["paths"][f"{dr}/{f['name']}"]
+                        f["dims"] = record.get("dims", {}).get(f"{dr}/{f['name']}")
+                        skipped += 1
+            continue
+        done[d["id"]] = (d, fingerprint)
+        for dr in dirs:
+            for f in d["files"].get(dr, []):
+                ifile = d["dir"].joinpath(dr, f["name"])
+                if ifile.is_file():
+                    targets.append((d, f, ifile))
+
+    # 幅・高さは同じ内容の画像で1度だけ調べる
+    sizes = {}
+
+    def try_file_hash(ifile):
+        # 読み込めない画像があっても他のデータの処理は続ける
+        try:
+            h = get_file_hash(ifile)
+        except Exception:
+            return None, traceback.format_exc()
+        if h not in sizes:
+            try:
+                sizes[h] = get_image_size(ifile)
+            except Exception:
+                sizes[h] = None
+        return h, None
+
+    with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as executor:
+        hashes = list(executor.map(try_file_hash, [ifile for d, f, ifile in targets]))
+
+    store = {}
+    saved_bytes = 0
+    for (d, f, ifile), (h, error) in zip(targets, hashes):
+        if h is None:
+            add_error(d, f"画像ファイル {f['name']} の読み込み", error, partial=True)
+            continue
+        name = f"images/{h[:2]}/{h}{ifile.suffix.lower()}"
+        if name in store:
+            saved_bytes += f["bytes"]
+        else:
+            store[name] = ifile
+        f["path"] = f"./{name}"
+        f["dims"] = sizes.get(h)
+
+    # コピーに失敗した画像は読み込めなかった場合と同じく扱い、そのデータは次回もやり直す
+    failed = out_sink.copy_files([(ifile, name) for name, ifile in store.items()])
+    for d, f, ifile in targets:
+        if f.get("path", "")[2:] in failed:
+            del f["path"]
+            add_error(d, f"画像ファイル {f['name']} のコピー", f"コピーに失敗しました: {ifile}", partial=True)
+
+    # コピーが終わったデータを記録する(読み込めなかった画像があるデータは次回もやり直す)
+    for d, fingerprint in done.values():
+        if d.get("errors") or d.get("partial_errors"):
+            continue
+        out_sink.begin("images", d["id"], fingerprint)
+        paths = {}
+        dims = {}
+        for dr in dirs:
+            for f in d["files"].get(dr, []):
+                if "path" in f:
+                    paths[f"{dr}/{f['name']}"] = f["path"]
+                    out_sink.add_file(f["path"][2:], f["bytes"])
+                if f.get("dims"):
+                    dims[f"{dr}/{f['name']}"] = f["dims"]
+        out_sink.commit(paths=paths, dims=dims)
+
+    if targets:
+        write_log(f"[Info] 画像ファイル {len(targets)} 件を {len(store)} 件に集約しました。(重複 {len(targets) - len(store)} 件、{format_file_size(saved_bytes)} 削減)")
+    if skipped:
+        write_log(f"[Info] コピー済みの画像ファイル {skipped} 件をスキップしました。")
 
 def write_log(text):
     """ 標準出力とログファイルへの書き込み """
@@ -2792,6 +5849,28 @@ def write_log(text):
     with open(LOG_FILE, "a", encoding="utf_8") as f:
         f.write(f"{datetime.now():%Y-%m-%d %H:%M:%S}\t{text}\n")
 
+def add_error(data, stage, error=None, partial=False):
+    """ データ1件分のエラーの記録(処理は続行する)(partialの場合は画像1件やカードなどその部分だけを除き、データ詳細ページは作成する) """
+
+    if error is None:
+        error = traceback.format_exc()
+    message = error.strip().splitlines()[-1]
+    data.setdefault("partial_errors" if partial else "errors", []).append(f"{stage}: {message}")
+    write_log(f"[Error] データID {data['id']} の{stage}でエラーが発生しました。{'この部分' if partial else 'このデータ'}を除いて処理を続行します。\n{error}")
+
+def write_error_summary(data_info):
+    """ エラーが発生したデータの一覧の出力 """
+
+    failed = [d for d in data_info if d.get("errors") or d.get("partial_errors")]
+    if len(failed) == 0:
+        return
+    write_log(f"[Error] {len(data_info)} 件中 {len(failed)} 件のデータでエラーが発生しました。")
+    for d in failed:
+        for e in d.get("errors", []):
+            write_log(f"[Error]   データID {d['id']}: {e}")
+        for e in d.get("partial_errors", []):
+            write_log(f"[Error]   データID {d['id']}: {e}(この部分を除いて作成)")
+
 def check_idir(input_dir):
     """ 入力フォルダのチェック """
 
@@ -2815,6 +5894,47 @@ def check_idir(input_dir):
 
     return flag
 
+def get_out_sink(root_dir, resume=False):
+    """ 出力先の取得 """
+
+    if OUTPUT_ARCHIVE is None:
+        if resume:
+            out_root_dir = get_resume_dir(root_dir)
+            if out_root_dir is not None:
+                return OutputDir(out_root_dir, resume=True)
+        return OutputDir(get_out_root_dir(root_dir))
+
+    if resume:
+        write_log("[Error] --resume はフォルダへ出力する場合のみ使用できます。最初から作成します。")
+
+    # 1000回までファイル名を変えて作成する
+    for i in range(1000):
+        if i == 0:
+            out_file = root_dir.joinpath(f"output_preview.{OUTPUT_ARCHIVE}")
+        else:
+            out_file = root_dir.joinpath(f"output_preview_{i:04d}.{OUTPUT_ARCHIVE}")
+
+        if not out_file.exists():
+            out_sink = OutputArchive(out_file)
+            write_log(f"[Info] 出力ファイル {out_file} を作成しました。")
+            break
+    else:
+        write_log("[Error] 出力ファイルを作成できませんでした。")
+        sys.exit(1)
+
+    return out_sink
+
+def get_resume_dir(root_dir):
+    """ 再開する出力フォルダ(記録が残っている最新のフォルダ)の取得 """
+
+    out_root_dirs = sorted(p for p in root_dir.glob("output_preview*") if p.joinpath(Journal.file_name).is_file())
+    if not out_root_dirs:
+        write_log("[Info] 再開できる出力フォルダがないため、最初から作成します。")
+        return None
+
+    write_log(f"[Info] 出力フォルダ {out_root_dirs[-1]} の続きから作成します。")
+    return out_root_dirs[-1]
+
 def get_out_root_dir(root_dir):
     """ 出力フォルダの取得 """
 
@@ -2830,7 +5950,7 @@ def get_out_root_dir(root_dir):
             write_log(f"[Info] 出力フォルダ {out_root_dir} を作成しました。")
             break
     else:
-        write_log(f"[Error] 出力フォルダを作成できませんでした。")
+        write_log("[Error] 出力フォルダを作成できませんでした。")
         sys.exit(1)
 
     return out_root_dir
@@ -2838,28 +5958,103 @@ def get_out_root_dir(root_dir):
 def help_msg():
     """ ヘルプメッセージ """
     print("""
-    usage: preview.py [-h] [input-data-dir]
+    usage: preview.py [-h] [--only IDS] [--first N] [--sample N [--seed S]] [--resume] [--progressive] [input-data-dir]
 
     positional arguments:
       input-data-dir  input data directory after structured
+                      (a zip file or an uncompressed tar file is also accepted)
 
     optional arguments:
-      -h, --help  show this help message and exit
+      -h, --help   show this help message and exit
+      --only IDS   preview only the given data ids (comma separated, e.g. 0001,0005)
+      --first N    preview only the first N divided data
+      --sample N   preview N randomly chosen divided data
+      --seed S     random seed for --sample
+                   (the top-level data is always included unless --only is given)
+      --resume     continue the latest output folder left by an interrupted run
+                   (pages and images already written are skipped)
+      --progressive  open the browser once the index and the first detail pages
+                     are ready, then create the rest while showing the progress
     """)
 
+def get_options(argv):
+    """ コマンドライン引数の解析 """
+
+    options = {"input":None, "only":None, "first":None, "sample":None, "seed":None, "resume":False, "progressive":False}
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg in ["--resume", "--progressive"]:
+            options[arg[2:]] = True
+        elif arg in ["--only", "--first", "--sample", "--seed"]:
+            if not args:
+                print(f"[Error] {arg} の値が指定されていません。")
+                help_msg()
+                sys.exit(1)
+            value = args.pop(0)
+            try:
+                if arg == "--only":
+                    ids = [v.strip() for v in value.split(",") if v.strip()]
+                    options["only"] = set(ids) | set(int(v) for v in ids if v.isdigit())
+                else:
+                    options[arg[2:]] = int(value)
+            except ValueError:
+                print(f"[Error] {arg} の値 {value} が正しくありません。")
+                help_msg()
+                sys.exit(1)
+        elif arg.startswith("--"):
+            print(f"[Error] 不明なオプション {arg} が指定されています。")
+            help_msg()
+            sys.exit(1)
+        else:
+            options["input"] = arg
+
+    return options
+
+def get_partial_note(options):
+    """ 部分プレビューの条件の説明 """
+
+    conditions = []
+    if options.get("only") is not None:
+        conditions.append("--only " + ",".join(sorted(v for v in options["only"] if isinstance(v, str))))
+    if options.get("first") is not None:
+        conditions.append(f"--first {options['first']}")
+    if options.get("sample") is not None:
+        conditions.append(f"--sample {options['sample']}" + (f" --seed {options['seed']}" if options.get("seed") is not None else ""))
+    return " ".join(conditions)
+
+def open_catalog(out_sink, root_dir, input_dir):
+    """ カタログを開く(zip/tarの入力やアーカイブへの出力では使わない) """
+
+    if not USE_CATALOG or isinstance(input_dir, ArchivePath) or not isinstance(out_sink, OutputDir):
+        return None
+
+    db_file = out_sink.root.joinpath(Catalog.file_name)
+    seeds = sorted(p.joinpath(Catalog.file_name) for p in root_dir.glob("output_preview*")
+                   if p != out_sink.root and p.joinpath(Catalog.file_name).is_file())
+    return Catalog(db_file, seeds[-1] if seeds else None)
+
+def open_browser(out_sink):
+    """ ブラウザでindex.htmlを開く """
+
+    browser = webbrowser.get()
+    browser.open_new_tab(f"{out_sink.root.joinpath('index.html').absolute()}")
+
 def main():
-    global LOG_FILE
+    global LOG_FILE, STYLE_FILE
+
+    options = get_options(sys.argv[1:])
 
     # 入力ファイルが指定されていない場合は直下のdataディレクトリを処理対象とする
-    if len(sys.argv) > 1:
-        input_dir  = Path(sys.argv[1]).resolve()
+    if options["input"] is not None:
+        input_dir  = Path(options["input"]).resolve()
         root_dir   = input_dir.parent
     else:
         root_dir  = Path(sys.argv[0]).resolve().parent
         input_dir = root_dir.joinpath("data")
     LOG_FILE = root_dir.joinpath("preview.log")
-    out_root_dir = get_out_root_dir(root_dir)
-    out_img_dir  = out_root_dir.joinpath("images")
+    input_dir = open_input_dir(input_dir)
+    out_sink = get_out_sink(root_dir, options["resume"])
 
     flag_idir = check_idir(input_dir)
     if flag_idir:
@@ -2869,28 +6064,85 @@ def main():
     try:
         metadef_data = read_json(input_dir.joinpath("tasksupport", "metadata-def.json"))
         invsche_data = read_json(input_dir.joinpath("tasksupport", "invoice.schema.json"))
-        data_info = get_data_info(input_dir)
+        matrix = MetaMatrix()
+        catalog = open_catalog(out_sink, root_dir, input_dir)
+        data_info = get_data_info(input_dir, options, matrix, catalog)
+        if catalog is not None:
+            catalog.close()
+
+        # 段階的に作成する場合は、一覧の先頭のデータだけ先に作成してブラウザを開く
+        if options["progressive"] and isinstance(out_sink, OutputArchive):
+            write_log("[Error] --progressive はフォルダへ出力する場合のみ使用できます。すべて作成してから終了します。")
+        if options["progressive"] and isinstance(out_sink, OutputDir):
+            first, rest = data_info[:PROGRESSIVE_FIRST], data_info[PROGRESSIVE_FIRST:]
+        else:
+            first, rest = data_info, []
 
         write_log("[Info] 画像ファイルのコピーを開始します。")
-        copy_images(input_dir, out_root_dir, out_img_dir)
+        copy_images(out_sink, first)
+        create_tile_pyramids(out_sink, first, root_dir)
         write_log("[Info] 画像ファイルのコピーが完了しました。")
 
-        write_log("[Info] style.cssの作成を開始します。")
-        create_css(out_root_dir)
-        write_log("[Info] style.cssの作成が完了しました。")
+        # 使われていないルールを除く場合は、すべてのページを出力するまで仮の参照先にする
+        # (途中経過はすべてのルールを含むstyle.cssで表示する。アーカイブは最後まで開かれないため作成しない)
+        if not (PRUNE_CSS and isinstance(out_sink, OutputArchive)):
+            write_log("[Info] style.cssの作成を開始します。")
+            create_css(out_sink)
+            write_log("[Info] style.cssの作成が完了しました。")
+        if PRUNE_CSS:
+            STYLE_FILE = PENDING_STYLE_FILE
+
+        create_assets(out_sink)
 
         write_log("[Info] index.htmlの作成を開始します。")
-        create_dataList(input_dir, out_root_dir, data_info)
+        create_dataList(input_dir, out_sink, data_info, get_partial_note(options), progress=bool(rest))
         write_log("[Info] index.htmlの作成が完了しました。")
 
+        write_log("[Info] matrix.htmlの作成を開始します。")
+        create_matrixPage(out_sink, matrix, metadef_data)
+        write_log("[Info] matrix.htmlの作成が完了しました。")
+
         write_log("[Info] dataDetailの作成を開始します。")
-        create_dataDetail(input_dir, out_root_dir, data_info, metadef_data, invsche_data)
+        create_dataDetail(input_dir, out_sink, first, metadef_data, invsche_data)
+
+        if rest:
+            # 残りはブラウザで見ている間に作成し、作成状況をprogress.jsで知らせる
+            progress = get_progress_writer(out_sink, len(first), len(data_info))
+            progress(0)
+            write_log(f"[Info] 先頭のデータ詳細 {len(first)} 件の作成が完了しました。ブラウザで開き、残り {len(rest)} 件を続けて作成します。")
+            try:
+                open_browser(out_sink)
+            except Exception:
+                write_log(f"[Error] ブラウザを開けませんでした。{out_sink.root.joinpath('index.html')} を開いてください。")
+
+            copy_images(out_sink, rest)
+            create_tile_pyramids(out_sink, rest, root_dir)
+            create_dataDetail(input_dir, out_sink, rest, metadef_data, invsche_data, progress)
+
+            # 残りのサムネイルを反映した一覧に置き換える
+            create_dataList(input_dir, out_sink, data_info, get_partial_note(options))
+
+        # 出力したページで使われているクラス名・IDからスタイルシートを作成し、各ページの参照先にする
+        if PRUNE_CSS:
+            out_sink.link_css(create_css(out_sink, out_sink.css_tokens.tokens))
         write_log("[Info] dataDetailの作成が完了しました。")
+        out_sink.close()
+        write_error_summary(data_info)
+
+        # アーカイブに出力した場合は展開してから開いてもらう
+        if isinstance(out_sink, OutputArchive):
+            input(f"正常に完了しました。{out_sink} を展開してindex.htmlを開いてください。Enterを押してください。")
+            return
+
+        # 段階的に作成した場合はブラウザを開いてある
+        if rest:
+            input("正常に完了しました。Enterを押してください。")
+            return
 
         input("正常に完了しました。プログラムを終了し、ブラウザで開きますのでEnterを押してください。")
-        browser = webbrowser.get()
-        browser.open_new_tab(f"{out_root_dir.joinpath('index.html').absolute()}")
+        open_browser(out_sink)
     except:
+        out_sink.close()
         write_log(f"[Error] 予期せぬエラーが発生しました。\n{traceback.format_exc()}")
         input("エラーが発生したため、処理を中止します。Enterを押してください。")
 